@@ -0,0 +1,89 @@
+"""
+Compare the grouped string join in data_transformations.join_by_smd() with the list-and-apply joins it replaced
+
+Run from the root of the repository:
+
+    python benchmarks/districts_candidates_commissioners.py
+
+The districts are the 345 SMDs of the 2022 redistricting, then all 641 SMDs in data/districts.csv.
+Each district gets between zero and six candidates drawn from data/people.csv, with links to their pages.
+Both implementations must produce identical columns.
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from scripts.data_transformations import join_by_smd
+from scripts.urls import generate_link
+
+
+
+def join_by_smd_apply(df, column, smd_ids, empty_value):
+    """The previous implementation: a list of values for each SMD, then a join for each row"""
+
+    lists_by_district = df.groupby('smd_id').agg(values_to_join=(column, list), number_of_values=(column, 'count')).reset_index()
+    districts = pd.merge(pd.DataFrame({'smd_id': smd_ids}), lists_by_district, how='left', on='smd_id')
+
+    districts['number_of_values'] = districts['number_of_values'].fillna(0).astype(int)
+
+    return districts.apply(
+        lambda x: ', '.join(x['values_to_join']) if x['number_of_values'] > 0 else empty_value
+        , axis=1
+        )
+
+
+
+def sample_candidates(smd_ids, people, rng):
+    """One row for each candidate, with a random number of candidates in each district"""
+
+    candidates_per_district = rng.integers(0, 7, size=len(smd_ids))
+    candidates = people.sample(n=candidates_per_district.sum(), replace=True, random_state=rng).reset_index(drop=True)
+
+    candidates['smd_id'] = np.repeat(smd_ids.to_numpy(), candidates_per_district)
+    candidates['name_link'] = [
+        generate_link(person_name_id, link_source='anc', link_body=full_name)
+        for person_name_id, full_name in zip(candidates.person_name_id, candidates.full_name)
+        ]
+
+    return candidates
+
+
+
+def timed(function, *args, repeat=20):
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        result = function(*args)
+
+    return result, (time.perf_counter() - start) / repeat
+
+
+
+def main():
+
+    districts = pd.read_csv('data/districts.csv')
+    people = pd.read_csv('data/people.csv')[['person_name_id', 'full_name']]
+    rng = np.random.default_rng(0)
+
+    for smd_ids in [districts[districts.redistricting_year == 2022].smd_id, districts.smd_id]:
+        smd_ids = smd_ids.reset_index(drop=True)
+        candidates = sample_candidates(smd_ids, people, rng)
+
+        reference, reference_seconds = timed(join_by_smd_apply, candidates, 'name_link', smd_ids, '(no known candidates)')
+        grouped, grouped_seconds = timed(join_by_smd, candidates, 'name_link', smd_ids, '(no known candidates)')
+
+        assert grouped.to_list() == reference.to_list()
+
+        print(f'{len(smd_ids)} districts, {len(candidates):,} candidates')
+        print(f'    list and apply:  {reference_seconds * 1000:.2f} ms')
+        print(f'    grouped join:    {grouped_seconds * 1000:.2f} ms ({reference_seconds / grouped_seconds:.1f}x)')
+
+
+
+if __name__ == '__main__':
+    main()
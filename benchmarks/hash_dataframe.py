@@ -0,0 +1,92 @@
+"""
+Compare common.hash_dataframe() with the row-by-row implementation it replaced
+
+Run from the root of the repository:
+
+    python benchmarks/hash_dataframe.py
+
+Every DCBOE election results file in data/dcboe/election_results/ is stacked into one table,
+and each row is hashed on its contest name and uppercase candidate name, the way external_ids are built.
+Both implementations must produce identical ids.
+"""
+
+import sys
+import glob
+import time
+import hashlib
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from scripts.common import hash_dataframe
+
+
+
+def hash_dataframe_iterrows(df, columns_to_hash, string_to_add=None):
+    """The previous implementation of hash_dataframe(), one row at a time"""
+
+    hash_of_data = []
+
+    for idx, row in df.iterrows():
+        list_to_hash = row[columns_to_hash]
+        string_to_hash = ','.join(list_to_hash)
+
+        if string_to_add:
+            string_to_hash += string_to_add
+
+        hash_of_data += [hashlib.sha224(string_to_hash.encode()).hexdigest()]
+
+    return hash_of_data
+
+
+
+def all_results():
+    """One table with the contest and candidate of every row of every results file"""
+
+    tables = []
+
+    for results_file in sorted(glob.glob('data/dcboe/election_results/*Results.csv')):
+        df = pd.read_csv(results_file, dtype=str)
+        df.columns = [c.lower() for c in df.columns]
+
+        # Files from before 2018 use the column names CONTEST_NAME and CANDIDATE
+        df = df.rename(columns={'contestname': 'contest_name', 'candidate': 'candidate_name'})
+        tables += [df[['contest_name', 'candidate_name']].fillna('')]
+
+    results = pd.concat(tables, ignore_index=True)
+    results['candidate_name_upper'] = results['candidate_name'].str.upper()
+
+    return results
+
+
+
+def timed(function, *args, **kwargs):
+
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+
+    return result, time.perf_counter() - start
+
+
+
+def main():
+
+    results = all_results()
+    columns = ['contest_name', 'candidate_name_upper']
+
+    reference, reference_seconds = timed(hash_dataframe_iterrows, results, columns, string_to_add='2024_votes')
+    batched, batched_seconds = timed(hash_dataframe, results, columns, string_to_add='2024_votes')
+    pooled, pooled_seconds = timed(hash_dataframe, results, columns, string_to_add='2024_votes', jobs=4)
+
+    assert batched == reference
+    assert pooled == reference
+
+    print(f'{len(results):,} rows')
+    print(f'iterrows:         {reference_seconds:.2f} s')
+    print(f'batched:          {batched_seconds:.2f} s ({reference_seconds / batched_seconds:.0f}x)')
+    print(f'batched, 4 jobs:  {pooled_seconds:.2f} s ({reference_seconds / pooled_seconds:.0f}x)')
+
+
+
+if __name__ == '__main__':
+    main()
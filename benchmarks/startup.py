@@ -0,0 +1,100 @@
+"""
+Measure how long build_site.py spends importing modules, using python -X importtime
+
+Run from the root of the repository:
+
+    python benchmarks/startup.py -i
+
+To compare against the tree before the lazy imports, check out that commit somewhere and pass its path:
+
+    git worktree add ../openanc-baseline b2d72b1~1
+    python benchmarks/startup.py --baseline ../openanc-baseline -i
+
+Other arguments are passed on to build_site.py, so the build step really runs and writes its pages to docs/
+(the baseline build writes to the docs/ of its own checkout).
+Import time is the sum of the cumulative time of every top-level import in the -X importtime log.
+The heavy optional dependencies that were loaded are listed, since a build step that doesn't need them
+shouldn't pay for them.
+"""
+
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+heavy_modules = ['geopandas', 'matplotlib', 'googleapiclient', 'google_auth_oauthlib', 'bs4']
+
+
+
+def import_times(build_args, tree='.'):
+    """
+    Run build_site.py in tree once with -X importtime. Return (total import seconds, set of heavy modules loaded)
+    """
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'build_site.py'] + build_args
+        , cwd=tree
+        , stdout=subprocess.DEVNULL
+        , stderr=subprocess.PIPE
+        , text=True
+        )
+
+    total_us = 0
+    loaded = set()
+
+    for line in result.stderr.splitlines():
+
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line.split('|')
+
+        # Top-level imports have no indentation after the separator
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+
+        module = name.strip()
+        if module in heavy_modules:
+            loaded.add(module)
+
+    return total_us / 1e6, loaded
+
+
+
+def median_import_times(build_args, tree='.', repeat=3):
+    """Return (median import seconds, sorted list of heavy modules loaded) over repeat runs"""
+
+    runs = [import_times(build_args, tree) for _ in range(repeat)]
+
+    return statistics.median(r[0] for r in runs), sorted(set.union(*[r[1] for r in runs]))
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', help='Path to a checkout of the repository to compare against')
+    args, build_args = parser.parse_known_args()
+    build_args = build_args or ['-i']
+
+    trees = {'current': '.'}
+    if args.baseline:
+        trees['baseline'] = args.baseline
+
+    print(f'build_site.py {" ".join(build_args)}')
+
+    seconds = {}
+    for label, tree in trees.items():
+        seconds[label], loaded = median_import_times(build_args, tree)
+        print(f'{label} ({tree})')
+        print(f'    import time: {seconds[label]:.2f} s (median of 3 runs)')
+        print(f'    heavy modules loaded: {", ".join(loaded) if loaded else "none"}')
+
+    if args.baseline:
+        print(f'baseline / current: {seconds["baseline"] / seconds["current"]:.1f}x')
+
+
+
+if __name__ == '__main__':
+    main()
@@ -7,15 +7,11 @@ import sys
 import argparse
 from datetime import datetime
 
-from scripts.refresh_data import RefreshData
-from scripts.process_candidates import ProcessCandidates
-from scripts.process_election_results import ProcessElectionResults
-from scripts.index import BuildIndex
-from scripts.districts import BuildDistricts
-from scripts.ancs import BuildANCs
-from scripts.wards import BuildWards
-from scripts.people import BuildPeople
-from tests.validate_links import ValidateLinks
+from scripts.data_store import DataStore, use_data_store
+from scripts.build_manifest import BuildManifest
+
+# Each build step imports its own module further down, so that running one step doesn't load
+# the dependencies of every other step (geopandas, matplotlib, the Google API clients)
 
 start_time = datetime.now()
 
@@ -31,9 +27,25 @@ parser.add_argument('-p', '--build-people', action='store_true', help='Build pag
 parser.add_argument('-v', '--validate-links', action='store_true', help='Confirm internal link validity')
 parser.add_argument('-e', '--election-results', action='store_true', help='Process election results from DCBOE')
 parser.add_argument('--all', action='store_true', help='Run all site-building steps')
+parser.add_argument('--incremental', action='store_true', help='Only rebuild district, ANC, ward and person pages whose inputs changed since the last incremental build')
+parser.add_argument('--keep-unchanged-dates', action='store_true', help='Leave pages in docs/ alone if only their "Last updated" date would change')
+parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes used to build district, ANC, ward and person pages, and to process election years')
 
 args = parser.parse_args()
 
+if args.keep_unchanged_dates:
+    from scripts.common import keep_unchanged_dates
+
+    keep_unchanged_dates()
+
+
+# Parse each CSV in data/ at most once per build, sharing the tables between every build step
+use_data_store(DataStore())
+
+
+# With --incremental, pages are skipped when their inputs match the manifest saved by the previous build
+manifest = BuildManifest() if args.incremental else None
+
 
 # Make directories if they don't already exist
 # os.makedirs('/docs/map_2012/ancs/districts', exist_ok=True)
@@ -58,38 +70,55 @@ if args.all:
 
 # todo: maybe put the refresh_data step after both of the process_ ones?
 if args.refresh_data:
+    from scripts.refresh_data import RefreshData
+
     r = RefreshData()
     r.run(args.full_refresh_data)
 
 # if args.candidates:
+#     from scripts.process_candidates import ProcessCandidates
 #     pc = ProcessCandidates()
 #     pc.run()
 
 if args.election_results:
+    from scripts.process_election_results import ProcessElectionResults
+
     er = ProcessElectionResults()
-    er.run()
+    er.run(jobs=args.jobs)
 
 if args.build_index:
+    from scripts.index import BuildIndex
+
     bi = BuildIndex()
     bi.run()
 
 if args.build_wards:
+    from scripts.wards import BuildWards
+
     bw = BuildWards()
-    bw.run()
+    bw.run(jobs=args.jobs, manifest=manifest)
 
 if args.build_ancs:
+    from scripts.ancs import BuildANCs
+
     ba = BuildANCs()
-    ba.run()
+    ba.run(jobs=args.jobs, manifest=manifest)
 
 if args.build_districts:
+    from scripts.districts import BuildDistricts
+
     bd = BuildDistricts()
-    bd.run()
+    bd.run(jobs=args.jobs, manifest=manifest)
 
 if args.build_people:
+    from scripts.people import BuildPeople
+
     bp = BuildPeople()
-    bp.run()
+    bp.run(jobs=args.jobs, manifest=manifest)
 
 if args.validate_links:
+    from tests.validate_links import ValidateLinks
+
     tl = ValidateLinks()
     tl.validate_internal_links()
 
@@ -37,4 +37,4 @@ to OpenANC functionality from changing versions,
 
 For most recent version, see: https://docs.mapbox.com/mapbox-gl-js/guides/
 """
-mapbox_gl_js_version = 'v2.15.0'
\ No newline at end of file
+mapbox_gl_js_version = 'v2.15.0'
@@ -2,28 +2,31 @@
 Build ANC pages
 """
 
-import hashlib
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import geopandas as gpd
 
 import config
 
+from scripts.data_store import load_csv
+from scripts.template import load_template
+
 from scripts.common import (
     build_smd_html_table
     , build_data_table
     , build_link_block
-    , add_footer
+    , footer_html
     , calculate_zoom
     , add_google_analytics
-    , add_geojson
-    , anc_geojson
+    , google_analytics_html
+    , shape_bounds
+    , html_table
     , mapbox_slugs
+    , build_pages
+    , write_html
     )
 
 from scripts.urls import (
-    generate_link
+    generate_links
     , generate_url
     , relative_link_prefix
     )
@@ -36,17 +39,16 @@ class BuildANCs():
 
     def __init__(self):
 
-        # Load GeoJSON for all ANCs to memory
-        self.geojson_shape = anc_geojson()
+        self.anc_bounds = shape_bounds('anc')
         self.mapbox_style_slugs = mapbox_slugs()
 
-        self.candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+        self.candidate_statuses = load_csv('data/candidate_statuses.csv')
         self.dcc = districts_candidates_commissioners(link_source='anc')
 
-        self.ancs = pd.read_csv('data/ancs.csv')
+        self.ancs = load_csv('data/ancs.csv')
         self.ancs['link_block'] = self.ancs.apply(lambda row: build_link_block(row, fields_to_try=['dc_oanc_link', 'anc_homepage_link', 'twitter_link']), axis=1)
 
-        self.districts = pd.read_csv('data/districts.csv')
+        self.districts = load_csv('data/districts.csv')
 
 
 
@@ -64,8 +66,7 @@ class BuildANCs():
 
         output = output.replace('REPLACE_WITH_LIST_VALUES', self.list_of_ancs(redistricting_year))
         
-        with open(f'docs/map_{redistricting_year}/ancs/index.html', 'w') as f:
-            f.write(output)
+        write_html(f'docs/map_{redistricting_year}/ancs/index.html', output)
 
 
 
@@ -77,20 +78,12 @@ class BuildANCs():
             )
 
         display_df = anc_districts.groupby(['anc_id', 'anc_name', 'sort_order']).agg(count_of_smds=('smd_id', 'size')).reset_index().sort_values(by='sort_order')
-        display_df['ANC'] = display_df.apply(lambda x: generate_link(x.anc_id, x.anc_name, link_source='anc'), axis=1)
+        display_df['ANC'] = generate_links(display_df.anc_id, display_df.anc_name, link_source='anc')
         display_df['Count of SMDs'] = display_df['count_of_smds']
 
         columns_to_html = ['ANC', 'Count of SMDs']
-        css_uuid = hashlib.sha224(display_df[columns_to_html].to_string().encode()).hexdigest() + '_'
-
-        html = (
-            display_df[columns_to_html]
-            .fillna('')
-            .style
-            .set_uuid(css_uuid)
-            .hide(axis='index')
-            .to_html()
-            )
+
+        html = html_table(display_df[columns_to_html].fillna(''))
 
         return html
 
@@ -151,67 +144,81 @@ class BuildANCs():
 
 
 
-    def build_all_anc_pages(self):
+    def build_all_anc_pages(self, jobs=1, manifest=None):
         """Build pages for each ANC"""
 
-        for _, anc in tqdm(self.ancs.iterrows(), total=len(self.ancs), desc='ANCs   '):
+        build_pages(self, 'build_anc_page', self.ancs, desc='ANCs   ', jobs=jobs, manifest=manifest)
+
+
+
+    def page_path(self, anc):
+        """Path of the page for one ANC"""
+
+        return 'docs/' + generate_url(anc.anc_id, link_source='root')
 
-            self.build_anc_page(anc)
+
+
+    def page_inputs(self, anc):
+        """
+        List everything the page for one ANC is built from, for incremental builds
+        """
+
+        smds_in_anc = self.districts[self.districts['anc_id'] == anc.anc_id]['smd_id'].to_list()
+        overlap_anc_ids = str(anc.overlap_ancs).split(', ')
+
+        return [
+            anc
+            , self.dcc[self.dcc['smd_id'].isin(smds_in_anc)]
+            , self.dcc.number_of_candidates.sum() > 0
+            , self.ancs.loc[self.ancs.anc_id.isin(overlap_anc_ids), ['anc_id', 'anc_name', 'redistricting_year']]
+            ]
 
 
 
     def build_anc_page(self, anc):
         """Build one ANC page"""
 
-        with open('templates/anc.html', 'r') as f:
-            output = f.read()
-        
-        output = add_google_analytics(output)
-        output = add_geojson(self.geojson_shape, 'anc_id', anc.anc_id, output)
-        
-        output = output.replace('REPLACE_WITH_MAPBOX_GL_JS_VERSION', config.mapbox_gl_js_version)
-        output = output.replace('REPLACE_WITH_ANC_NAME', f'{anc.anc_name} [{anc.redistricting_cycle} Cycle]')
-        
         if anc['redistricting_year'] == 2012:
             mapbox_slug_id = 'smd'
         else:
             mapbox_slug_id = 'smd-2022'
 
-        output = output.replace('REPLACE_WITH_MAPBOX_SLUG', self.mapbox_style_slugs[mapbox_slug_id])
-
-
         smds_in_anc = self.districts[self.districts['anc_id'] == anc.anc_id]['smd_id'].to_list()
-        output = output.replace('<!-- replace with district list -->', build_smd_html_table(
-            smds_in_anc
-            , link_source='anc'
-            , district_comm_commelect=self.dcc
-            , candidate_statuses=self.candidate_statuses
-            ))
 
         fields_to_try = ['notes', 'link_block']
-        output = output.replace('<!-- replace with anc link list -->', build_data_table(anc, fields_to_try, link_source='anc'))
 
-        output = output.replace('<!-- replace with old/new heading -->', self.old_new_heading(anc.anc_id))
-        output = output.replace('<!-- replace with overlap -->', self.overlap_list(anc.anc_id))
-        
-        output = output.replace('REPLACE_WITH_LONGITUDE', str(anc['centroid_lon']))
-        output = output.replace('REPLACE_WITH_LATITUDE', str(anc['centroid_lat']))
-        output = output.replace('REPLACE_WITH_ZOOM_LEVEL', str(calculate_zoom(anc['area'])))
-
-        output = add_footer(output, link_source='anc')
+        output = load_template('anc.html').render({
+            'google_analytics': google_analytics_html
+            , 'xy': self.anc_bounds[anc.anc_id]
+            , 'mapbox_gl_js_version': config.mapbox_gl_js_version
+            , 'anc_name': f'{anc.anc_name} [{anc.redistricting_cycle} Cycle]'
+            , 'mapbox_slug': self.mapbox_style_slugs[mapbox_slug_id]
+            , 'district_list': build_smd_html_table(
+                smds_in_anc
+                , link_source='anc'
+                , district_comm_commelect=self.dcc
+                , candidate_statuses=self.candidate_statuses
+                )
+            , 'anc_link_list': build_data_table(anc, fields_to_try, link_source='anc')
+            , 'old_new_heading': self.old_new_heading(anc.anc_id)
+            , 'overlap': self.overlap_list(anc.anc_id)
+            , 'longitude': str(anc['centroid_lon'])
+            , 'latitude': str(anc['centroid_lat'])
+            , 'zoom_level': str(calculate_zoom(anc['area']))
+            , 'footer': footer_html(link_source='anc')
+            })
 
-        with open('docs/' + generate_url(anc.anc_id, link_source='root'), 'w') as f:
-            f.write(output)
+        write_html(self.page_path(anc), output)
 
 
 
-    def run(self):
+    def run(self, jobs=1, manifest=None):
         """Build pages for each ANC"""
 
         for ry in [2012, 2022]:
             self.anc_list_page(redistricting_year=ry)
 
 
-        self.build_all_anc_pages()
+        self.build_all_anc_pages(jobs, manifest)
 
         
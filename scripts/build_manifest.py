@@ -0,0 +1,115 @@
+"""
+Manifest of the inputs that produced each page in docs/, for incremental builds
+
+Each page builder describes the inputs of one page with a page_inputs(row) method: the rows of
+data that end up on the page, plus any other values the page depends on. Those inputs are hashed
+into a fingerprint, together with the fingerprint of everything that every page shares: templates,
+code, config, maps, lookup tables and today's date, which is printed in the footer of every page.
+
+build_site.py --incremental saves the fingerprint of every page it builds to data/.cache/build_manifest.json.
+On the next incremental build, a page whose fingerprint is unchanged and whose file still exists is skipped.
+"""
+
+import os
+import json
+import hashlib
+import pandas as pd
+from glob import glob
+
+from scripts.common import current_date_str
+
+from scripts.data_store import (
+    cache_dir
+    , file_digest
+    )
+
+
+
+manifest_path = cache_dir / 'build_manifest.json'
+
+# Files that can change the output of any page
+shared_input_patterns = [
+    'config.py'
+    , 'scripts/*.py'
+    , 'templates/*'
+    , 'maps/*.geojson'
+    , 'data/field_names.csv'
+    , 'data/candidate_statuses.csv'
+    , 'data/mapbox_styles.csv'
+    ]
+
+
+
+class BuildManifest():
+
+    def __init__(self, path=manifest_path):
+
+        self.path = path
+
+        # Keyed by page path, such as 'docs/map_2022/ancs/districts/1a01.html'. Value is the page's fingerprint
+        self.fingerprints = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.fingerprints = json.load(f)
+
+        self.shared_fingerprint = fingerprint(*[file_digest(p) for p in shared_input_files()], current_date_str())
+
+
+
+    def page_fingerprint(self, page_inputs):
+        """Return the fingerprint of one page, given the list of its inputs"""
+
+        return fingerprint(self.shared_fingerprint, *page_inputs)
+
+
+
+    def is_current(self, page_path, page_fingerprint):
+        """True if the page at page_path was built from exactly these inputs and is still on disk"""
+
+        return self.fingerprints.get(page_path) == page_fingerprint and os.path.exists(page_path)
+
+
+
+    def record(self, page_path, page_fingerprint):
+        """Note that the page at page_path has been built from the inputs with this fingerprint"""
+
+        self.fingerprints[page_path] = page_fingerprint
+
+
+
+    def save(self):
+        """Write the manifest to disk"""
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with open(self.path, 'w') as f:
+            json.dump(self.fingerprints, f, indent=0, sort_keys=True)
+
+
+
+def shared_input_files():
+    """Sorted list of the files matched by shared_input_patterns"""
+
+    return sorted(p for pattern in shared_input_patterns for p in glob(pattern) if os.path.isfile(p))
+
+
+
+def fingerprint(*inputs):
+    """
+    Return the SHA-224 hash of a list of inputs
+
+    DataFrames and Series are hashed by their CSV representation, everything else by its string representation.
+    """
+
+    digest = hashlib.sha224()
+
+    for i in inputs:
+
+        if isinstance(i, (pd.DataFrame, pd.Series)):
+            i = i.to_csv()
+
+        digest.update(str(i).encode())
+        digest.update(b'\x1f')
+
+    return digest.hexdigest()
@@ -1,14 +1,23 @@
 
+import os
+import re
 import pytz
 import hashlib
+import multiprocessing
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
-import geopandas as gpd
 from datetime import datetime
 
 import config
 
+from scripts.data_store import (
+    load_csv
+    , file_digest
+    , cache_dir
+    )
+from scripts.template import load_template
+
 from scripts.data_transformations import (
     list_commissioners
     , list_candidates
@@ -19,6 +28,7 @@ from scripts.data_transformations import (
 
 from scripts.urls import (
     generate_link
+    , generate_links
     , relative_link_prefix
     )
 
@@ -27,6 +37,9 @@ from scripts.urls import (
 def smd_geojson():
     """Return a GeoDataFrame with SMDs from all redistricting cycles"""
 
+    # Imported here so that build steps without maps don't have to load geopandas
+    import geopandas as gpd
+
     map_2012 = gpd.read_file('maps/smd-2012-preprocessed.geojson')
     map_2022 = gpd.read_file('maps/smd-2022-preprocessed.geojson')
 
@@ -40,6 +53,8 @@ def smd_geojson():
 def anc_geojson():
     """Return a GeoDataFrame with SMDs from all redistricting cycles"""
 
+    import geopandas as gpd
+
     map_2012 = gpd.read_file('maps/anc-2012.geojson')
     map_2022 = gpd.read_file('maps/anc-2022.geojson')
 
@@ -53,6 +68,8 @@ def anc_geojson():
 def ward_geojson():
     """Return a GeoDataFrame with wards from all redistricting cycles"""
 
+    import geopandas as gpd
+
     map_2012 = gpd.read_file('maps/ward-from-smd-2012.geojson')
     map_2022 = gpd.read_file('maps/ward-from-smd-2022.geojson')
 
@@ -68,7 +85,7 @@ def mapbox_slugs():
     Return dict containing mapping of mapbox style id -> url slug
     """
 
-    mb_styles = pd.read_csv('data/mapbox_styles.csv')
+    mb_styles = load_csv('data/mapbox_styles.csv')
     mb_style_slugs = {}
     for idx, row in mb_styles.iterrows():
         mb_style_slugs[row['id']] = row['mapbox_link'][row['mapbox_link'].rfind('/')+1 :]
@@ -95,12 +112,7 @@ def candidate_form_link(link_text='Candidate Declaration Form', smd_id=None):
 
 
 
-def add_google_analytics(input_html):
-    """
-    Return HTML with Google Analytics block added
-    """
-
-    ga_block = """
+google_analytics_html = """
         <!-- Google tag (gtag.js) -->
         <script async src="https://www.googletagmanager.com/gtag/js?id=G-3V9Z79S3R9"></script>
         <script>
@@ -112,64 +124,86 @@ def add_google_analytics(input_html):
         </script>
         """
 
-    output_html = input_html.replace('<!-- replace with google analytics -->', ga_block)
+
+
+def add_google_analytics(input_html):
+    """
+    Return HTML with Google Analytics block added
+    """
+
+    output_html = input_html.replace('<!-- replace with google analytics -->', google_analytics_html)
 
     return output_html
 
 
 
-def add_geojson(shape_gdf, field_name, field_value, input_html):
-    """
-    Add a GeoJSON feature as a Javascript variable to an HTML string. This variable will be used to calculate the bounds of the map.
+# For each type of shape: the GeoJSON files it comes from, the function that loads them and the id field
+shape_sources = {
+    'smd': (['maps/smd-2012-preprocessed.geojson', 'maps/smd-2022-preprocessed.geojson'], smd_geojson, 'smd_id')
+    , 'anc': (['maps/anc-2012.geojson', 'maps/anc-2022.geojson'], anc_geojson, 'anc_id')
+    , 'ward': (['maps/ward-from-smd-2012.geojson', 'maps/ward-from-smd-2022.geojson'], ward_geojson, 'ward_id')
+    }
 
-    The shape is reduced to a 4-value bounding box to reduce the size of the HTML file. 
-    """
-    
-    shape_row = shape_gdf[shape_gdf[field_name] == field_value].copy()
 
-    # Calculate the bounds of this shape, which will determine the view window on this district's page
-    bounds_df = shape_row.geometry.bounds.squeeze()
-    geo_bounds = [[bounds_df.minx, bounds_df.maxx], [bounds_df.miny, bounds_df.maxy]]
 
-    output_string = '[['
+def shape_bounds(shape_type):
+    """
+    Return dict of id -> bounding box for every shape of shape_type ('smd', 'anc' or 'ward')
 
-    for idx, value in enumerate(geo_bounds[0]):
+    The bounding box is written as the coordinates of a GeoJSON feature, and is used on each page
+    to set the view window of the map.
 
-        if idx > 0: 
-            output_string += ','
-        
-        output_string += '['
+    The bounds of all shapes are calculated at once and saved to a small CSV in data/.cache/,
+    keyed by the hash of the GeoJSON files. Until those files change, the GeoJSON isn't loaded at all.
+    """
 
-        x = geo_bounds[0][idx]
-        output_string += '{}'.format(x)
+    source_files, load_shapes, id_field = shape_sources[shape_type]
 
-        y = geo_bounds[1][idx]
-        output_string += ', {}'.format(y)
+    digest = hashlib.sha224(''.join(file_digest(f) for f in source_files).encode()).hexdigest()
+    bounds_path = cache_dir / f'bounds__{shape_type}-{digest}.csv'
 
-        output_string += ']\n'
+    if bounds_path.exists():
+        # round_trip keeps every coordinate exactly as it was calculated
+        bounds = pd.read_csv(bounds_path, float_precision='round_trip')
 
-    output_string += ']]'
+    else:
+        shapes = load_shapes()
+        bounds = shapes.geometry.bounds.reset_index(drop=True)
+        bounds.insert(0, id_field, shapes[id_field].values)
 
-    output_html = input_html.replace('REPLACE_WITH_XY', output_string)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for old_file in cache_dir.glob(f'bounds__{shape_type}-*.csv'):
+            old_file.unlink()
 
-    return output_html
+        bounds.to_csv(bounds_path, index=False)
+
+    return dict(zip(
+        bounds[id_field]
+        , [
+            f'[[[{minx}, {miny}]\n,[{maxx}, {maxy}]\n]]'
+            for minx, miny, maxx, maxy in zip(bounds.minx.tolist(), bounds.miny.tolist(), bounds.maxx.tolist(), bounds.maxy.tolist())
+            ]
+        ))
 
 
 
-def assemble_divo():
+def assemble_divo(election_year=None):
     """
     Return DataFrame with one row per SMD and various stats about each SMD's ranking
 
-    divo = district-votes
+    divo = district-votes. Votes and turnout come from data/dcboe/smd_turnout.csv, written by ProcessElectionResults.
+    By default, the most recent election year in that table is used.
 
     todo: move to data_transformations
-    todo 2025: maybe not needed anymore
     """
 
-    results = pd.read_csv('data/results.csv')
-    districts = pd.read_csv('data/districts.csv')
+    smd_turnout = load_csv('data/dcboe/smd_turnout.csv')
+    districts = load_csv('data/districts.csv')
 
-    votes_per_smd = pd.DataFrame(results.groupby('smd_id').votes.sum()).reset_index()
+    if election_year is None:
+        election_year = smd_turnout.election_year.max()
+
+    votes_per_smd = smd_turnout[smd_turnout.election_year == election_year].drop(columns='election_year')
 
     # Calculate number of SMDs in each Ward and ANC
     smds_per_ward = pd.DataFrame(districts.groupby('ward_id').size(), columns=['smds_in_ward']).reset_index()
@@ -178,7 +212,7 @@ def assemble_divo():
     divo = pd.merge(districts, votes_per_smd, how='inner', on='smd_id')
     divo = pd.merge(divo, smds_per_ward, how='inner', on='ward_id')
     divo = pd.merge(divo, smds_per_anc, how='inner', on='anc_id')
-    divo['smds_in_dc'] = len(districts)
+    divo['smds_in_dc'] = len(divo)
 
     # Rank each SMD by the number of votes recorded for ANC races within that SMD
     # method = min: assigns the lowest rank when multiple rows are tied
@@ -187,21 +221,88 @@ def assemble_divo():
     divo['rank_anc'] = divo.groupby('anc_id').votes.rank(method='min', ascending=False)
 
     # Create strings showing the ranking of each SMD within its ANC, Ward, and DC-wide
-    divo['string_dc'] = divo.apply(
-        lambda row: f"{make_ordinal(row['rank_dc'])} out of {row['smds_in_dc']} SMDs", axis=1)
+    divo['string_dc'] = [f'{make_ordinal(r)} out of {n} SMDs' for r, n in zip(divo['rank_dc'], divo['smds_in_dc'])]
+    divo['string_ward'] = [f'{make_ordinal(r)} out of {n} SMDs' for r, n in zip(divo['rank_ward'], divo['smds_in_ward'])]
+    divo['string_anc'] = [f'{make_ordinal(r)} out of {n} SMDs' for r, n in zip(divo['rank_anc'], divo['smds_in_anc'])]
+
+    return divo
 
-    divo['string_ward'] = divo.apply(
-        lambda row: f"{make_ordinal(row['rank_ward'])} out of {row['smds_in_ward']} SMDs", axis=1)
 
-    divo['string_anc'] = divo.apply(
-        lambda row: f"{make_ordinal(row['rank_anc'])} out of {row['smds_in_anc']} SMDs", axis=1)
 
+def html_table(df, align={}, width={}, formats={}, highlight={}, bold_last_row=False, show_index=False):
+    """
+    Return an HTML table with one row per row of df, a faster replacement for df.style...to_html()
 
-    average_votes_in_dc = divo.votes.mean()
-    average_votes_by_ward = divo.groupby('ward_id').votes.mean()
-    average_votes_by_anc = divo.groupby('anc_id').votes.mean()
+    The table uses the classes defined in docs/nonmap.css instead of a CSS block with an id for every cell.
 
-    return divo
+    align = dict of column name -> 'left', 'right' or 'center'. Cells are centered by default
+    width = dict of column name -> width in pixels, which needs a matching width_ class in nonmap.css
+    formats = dict of column name -> function that turns each value into its display string
+    highlight = dict of column name -> function that returns True for the values to highlight
+    bold_last_row = if True, the last row is displayed in bold, for a row of totals
+    show_index = if True, the index is displayed as the first column
+    """
+
+    columns = list(df.columns)
+
+    column_classes = {}
+    for c in columns:
+        column_classes[c] = ' '.join(
+            ['data']
+            + ([f'align_{align[c]}'] if c in align else [])
+            + ([f'width_{width[c]}'] if c in width else [])
+            )
+
+    # Format each column once, rather than cell by cell
+    display_values = {}
+    for c in columns:
+        format_function = formats.get(c, default_display_value)
+        display_values[c] = [format_function(x) for x in df[c].tolist()]
+
+    highlighted = {c: [bool(highlight[c](x)) for x in df[c].tolist()] for c in highlight}
+
+    html = '<table>\n  <thead>\n    <tr>\n'
+
+    if show_index:
+        index_name = df.index.name if df.index.name else '&nbsp;'
+        html += f'      <th class="blank">{index_name}</th>\n'
+
+    html += ''.join(f'      <th class="col_heading">{c}</th>\n' for c in columns)
+    html += '    </tr>\n  </thead>\n  <tbody>\n'
+
+    index_values = df.index.tolist()
+    last_row = len(df) - 1
+
+    for i in range(len(df)):
+
+        row_class = ' class="total_row"' if bold_last_row and i == last_row else ''
+        html += f'    <tr{row_class}>\n'
+
+        if show_index:
+            html += f'      <th class="row_heading">{index_values[i]}</th>\n'
+
+        for c in columns:
+            cell_class = column_classes[c]
+            if c in highlighted and highlighted[c][i]:
+                cell_class += ' highlight'
+
+            html += f'      <td class="{cell_class}">{display_values[c][i]}</td>\n'
+
+        html += '    </tr>\n'
+
+    html += '  </tbody>\n</table>\n'
+
+    return html
+
+
+
+def default_display_value(x):
+    """Display a value the same way that pandas Styler does by default"""
+
+    if isinstance(x, (float, np.floating)):
+        return f'{x:.6f}'
+
+    return str(x)
 
 
 
@@ -220,13 +321,13 @@ def build_smd_html_table(list_of_smds, link_source=None, district_comm_commelect
         district_comm_commelect = districts_candidates_commissioners(link_source=link_source)
 
     if len(candidate_statuses) == 0:
-        candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+        candidate_statuses = load_csv('data/candidate_statuses.csv')
     
     candidate_statuses = candidate_statuses.set_index('display_order').copy()
     
     display_df = district_comm_commelect[district_comm_commelect['smd_id'].isin(list_of_smds)].copy()
 
-    display_df['SMD'] = display_df.apply(lambda x: generate_link(x.smd_id, link_source=link_source, link_body=x.smd_name), axis=1)
+    display_df['SMD'] = generate_links(display_df.smd_id, display_df.smd_name, link_source=link_source)
 
     status_columns = [c for c in display_df.columns if c.startswith('list_of_candidates_status_')]
     candidate_status_name_list = []
@@ -260,42 +361,27 @@ def build_smd_html_table(list_of_smds, link_source=None, district_comm_commelect
     if district_comm_commelect.number_of_candidates.sum() > 0:
         columns_to_html += ['Candidates']
 
-    # Hash the first column and all column names. Used a CSS id for the resulting table.
-    # First column + column names should change less frequently than the table contents.
-    first_column_plus_column_names = ';'.join(list(display_df[columns_to_html[0]]) + columns_to_html)
-    css_uuid = hashlib.sha224(first_column_plus_column_names.encode()).hexdigest() + '_'
-
     # The non-SMD columns should be formatted with left alignment
     subset_columns = [c for c in columns_to_html if c not in ('SMD', 'Election Year')]
 
-    html = (
-        display_df[columns_to_html]
-        .fillna('')
-        .style
-        .set_properties(
-            subset=subset_columns
-            , **{'width': '230px', 'text-align': 'left'} # 230px fits the longest commissioner name on one row
-            ) # why is the width in pixels so different between these columns? 
-        .set_uuid(css_uuid)
-        .hide(axis='index')
-        .to_html()
+    html = html_table(
+        display_df[columns_to_html].fillna('')
+        , align={c: 'left' for c in subset_columns}
+        , width={c: 230 for c in subset_columns} # 230px fits the longest commissioner name on one row
         )
 
     return html
 
 
 
-def build_district_list(smd_id_list=None, link_source='root', show_redistricting_cycle=False):
+def districts_current_commissioners():
     """
-    Bulleted list of districts and current commmissioners
+    Return DataFrame with one row per district, joined to its current commissioner.
 
-    If smd_id_list is None, all districts are returned
-    If smd_id_list is a list, those SMDs are returned
-
-    If show_redistricting_cycle is True, then the year of the cycle will be displayed.
+    Districts without a current commissioner have a full_name of "(vacant)".
     """
 
-    districts = pd.read_csv('data/districts.csv')
+    districts = load_csv('data/districts.csv')
     commissioners = list_commissioners(status='current')
     people = people_dataframe()
 
@@ -304,6 +390,28 @@ def build_district_list(smd_id_list=None, link_source='root', show_redistricting
 
     dcp['full_name'] = dcp['full_name'].fillna('(vacant)')
 
+    return dcp
+
+
+
+def build_district_list(smd_id_list=None, link_source='root', show_redistricting_cycle=False, district_commissioners=pd.DataFrame()):
+    """
+    Bulleted list of districts and current commmissioners
+
+    If smd_id_list is None, all districts are returned
+    If smd_id_list is a list, those SMDs are returned
+
+    If show_redistricting_cycle is True, then the year of the cycle will be displayed.
+
+    Like build_smd_html_table(), the district_commissioners argument lets a caller building many lists
+    pass in the result of districts_current_commissioners() once, instead of it being rebuilt for every list.
+    """
+
+    if len(district_commissioners) == 0:
+        dcp = districts_current_commissioners()
+    else:
+        dcp = district_commissioners
+
     if not smd_id_list:
         # List all SMDs by default
         smd_id_list = sorted(dcp['smd_id'].to_list())
@@ -350,7 +458,7 @@ def build_data_table(row, fields_to_try, link_source='root'):
     th_class = 'attribute_heading'
     td_class = 'attribute_value'
 
-    field_names = pd.read_csv('data/field_names.csv')
+    field_names = load_csv('data/field_names.csv')
         
     output_table = """
         <table>
@@ -415,7 +523,7 @@ def build_link_block(row, fields_to_try):
     Create HTML links in one block, intended to be one field within build_data_table()
     """
 
-    field_names = pd.read_csv('data/field_names.csv')
+    field_names = load_csv('data/field_names.csv')
 
     link_block = ''
 
@@ -486,22 +594,76 @@ def add_footer(input_html, link_source='root', updated_at=None):
     Return HTML with footer included
     """
 
-    with open('templates/footer.html', 'r') as f:
-        footer_html = f.read()
+    output_html = input_html.replace('<!-- replace with footer -->', footer_html(link_source, updated_at))
+
+    return output_html
 
-    link_path = relative_link_prefix(source=link_source, destination='root')
+
+
+def footer_html(link_source='root', updated_at=None):
+    """
+    Return the footer for a page at link_source
+    """
 
     if not updated_at:
         updated_at = current_date_str()
 
-    footer_html = footer_html.replace('REPLACE_WITH_LINK_PATH___', link_path)
+    return load_template('footer.html').render({
+        'link_path': relative_link_prefix(source=link_source, destination='root')
+        # , 'edit_items': edit_item_list()
+        , 'updated_at': updated_at
+        })
 
-    # footer_html = footer_html.replace('<!-- replace with edit items -->', edit_item_list())
-    footer_html = footer_html.replace('REPLACE_WITH_UPDATED_AT', updated_at)
 
-    output_html = input_html.replace('<!-- replace with footer -->', footer_html)
 
-    return output_html
+# The "Last updated" line added to every page by add_footer()
+updated_at_pattern = re.compile(r'<p>Last updated: [^<]*</p>')
+
+# Every page ends with "Last updated: <today's date>", so pages differ from one day to the next
+# even when nothing else about them changed. When this is True, a page that only differs from the copy
+# already in docs/ by that date is not rewritten, and keeps the date of its last real change.
+# build_site.py sets this with the --keep-unchanged-dates option, and build_pages() hands it to each worker.
+ignore_updated_at_when_writing = False
+
+
+
+def keep_unchanged_dates(keep=True):
+    """Set whether write_html() leaves a page alone when only its "Last updated" date would change"""
+
+    global ignore_updated_at_when_writing
+    ignore_updated_at_when_writing = keep
+
+
+
+def write_html(html_path, output_html):
+    """
+    Write output_html to the file at html_path, unless that file already contains exactly the same page
+
+    Skipping identical pages saves writes, and keeps untouched pages out of the diff of docs/.
+    If ignore_updated_at_when_writing is True, a page that differs from the file on disk
+    only in its "Last updated" date is not written either.
+
+    Returns True if the file was written.
+    """
+
+    if os.path.exists(html_path):
+
+        with open(html_path, 'r') as f:
+            existing_html = f.read()
+
+        if existing_html == output_html:
+            return False
+
+        if (
+            ignore_updated_at_when_writing
+            and updated_at_pattern.sub('', existing_html) == updated_at_pattern.sub('', output_html)
+            ):
+            return False
+
+    with open(html_path, 'w') as f:
+        f.write(output_html)
+
+    return True
 
 
 
@@ -513,28 +675,128 @@ def edit_item_list():
 
 
 
-def hash_dataframe(df, columns_to_hash, string_to_add=None):
+def hash_dataframe(df, columns_to_hash, string_to_add=None, jobs=1):
     """
     Given a DataFrame, hash certain columns
 
     df = pandas DataFrame
     columns_to_hash = a list containing the column names that should be hashed
+    string_to_add = string appended to every row's values before hashing
+    jobs = number of worker processes to spread the hashing across
+
+    Returns a list with the SHA-224 hex digest of each row's values joined by commas.
+    The columns are joined for all rows at once, then the hashes are calculated in one batch.
 
     todo: move to data_transformations
     """
 
-    hash_of_data = []
+    if len(df) == 0:
+        return []
+
+    strings_to_hash = df[columns_to_hash[0]].str.cat([df[c] for c in columns_to_hash[1:]], sep=',')
+
+    if string_to_add:
+        strings_to_hash = strings_to_hash + string_to_add
+
+    strings_to_hash = strings_to_hash.tolist()
+
+    if jobs <= 1:
+        return sha224_hexdigests(strings_to_hash)
+
+    chunk_size = -(-len(strings_to_hash) // jobs)
+    chunks = [strings_to_hash[i : i + chunk_size] for i in range(0, len(strings_to_hash), chunk_size)]
+
+    with multiprocessing.Pool(jobs) as pool:
+        return [h for chunk_hashes in pool.map(sha224_hexdigests, chunks) for h in chunk_hashes]
+
+
+
+def sha224_hexdigests(strings_to_hash):
+    """Return the SHA-224 hex digest of each string in a list"""
+
+    sha224 = hashlib.sha224
+
+    return [sha224(s.encode()).hexdigest() for s in strings_to_hash]
+
+
+
+def group_rows(df, key):
+    """
+    Return dict of {value of key column: DataFrame of the rows with that value}
+
+    Filtering a whole DataFrame for one district at a time is slow when it's done for every district.
+    Grouping once up front turns each of those filters into a dictionary lookup.
+    Keys that are missing from df are missing from the dict, so look them up with .get(key, df.iloc[0:0])
+    """
+
+    return {value: rows for value, rows in df.groupby(key, sort=False)}
+
+
+
+def build_pages(builder, method_name, rows, desc, jobs=1, manifest=None):
+    """
+    Build one page per row of the DataFrame rows by calling builder.method_name(row)
+
+    With jobs greater than 1, the pages are spread across that many worker processes.
+    The builder, with all of its shared DataFrames, is handed to each worker once when the pool starts,
+    so only the row for each page is sent to a worker after that. So is the --keep-unchanged-dates setting,
+    which a worker started with the spawn method would otherwise not see.
+
+    With a BuildManifest, only pages whose inputs changed since the last build are built. The builder
+    then needs a page_path(row) method and a page_inputs(row) method listing everything the page depends on.
+    """
+
+    page_rows = [row for _, row in rows.iterrows()]
+
+    if manifest is not None:
+        page_paths = [builder.page_path(row) for row in page_rows]
+        page_fingerprints = [manifest.page_fingerprint(builder.page_inputs(row)) for row in page_rows]
+        stale_pages = [i for i, (p, fp) in enumerate(zip(page_paths, page_fingerprints)) if not manifest.is_current(p, fp)]
+
+        print(f'{desc.strip()}: {len(page_rows) - len(stale_pages)} of {len(page_rows)} pages unchanged')
+        page_rows = [page_rows[i] for i in stale_pages]
+
+    if jobs <= 1:
+
+        build_page = getattr(builder, method_name)
+
+        for row in tqdm(page_rows, desc=desc):
+            build_page(row)
+
+    else:
+
+        with multiprocessing.Pool(jobs, initializer=start_page_worker, initargs=(builder, method_name, ignore_updated_at_when_writing)) as pool:
+            for _ in tqdm(pool.imap_unordered(build_page_in_worker, page_rows, chunksize=8), total=len(page_rows), desc=desc):
+                pass
+
+    if manifest is not None:
+
+        for i in stale_pages:
+            manifest.record(page_paths[i], page_fingerprints[i])
+
+        manifest.save()
+
+
+
+# Set in each worker process by start_page_worker()
+worker_build_page = None
+
+
+
+def start_page_worker(builder, method_name, ignore_updated_at=False):
+    """Keep the page-building method of builder around for every page this worker builds"""
+
+    global worker_build_page
+    worker_build_page = getattr(builder, method_name)
+
+    keep_unchanged_dates(ignore_updated_at)
 
-    for idx, row in df.iterrows():
-        list_to_hash = row[columns_to_hash]
-        string_to_hash = ','.join(list_to_hash)
 
-        if string_to_add:
-            string_to_hash += string_to_add
 
-        hash_of_data += [hashlib.sha224(string_to_hash.encode()).hexdigest()]
+def build_page_in_worker(row):
+    """Build one page inside a worker process"""
 
-    return hash_of_data
+    worker_build_page(row)
 
 
 
@@ -543,7 +805,7 @@ def validate_smd_ids(df):
     Given a DataFrame with an smd_id column, ensure that the smd_ids are all valid
     """
 
-    districts = pd.read_csv('data/districts.csv')
+    districts = load_csv('data/districts.csv')
     invalid_smd_ids = [d for d in list(df.smd_id) if d not in list(districts.smd_id)]
 
     if invalid_smd_ids:
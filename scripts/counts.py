@@ -5,16 +5,10 @@ import pytz
 import pandas as pd
 from datetime import datetime
 
-import matplotlib as mpl
-from matplotlib import rc
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
-import matplotlib.font_manager as fm
-from matplotlib._color_data import TABLEAU_COLORS
-
 from scripts.common import (
     assemble_divo
     , current_date_str
+    , html_table
     )
 
 from scripts.data_transformations import (
@@ -23,9 +17,9 @@ from scripts.data_transformations import (
     , districts_candidates_commissioners
     )
 
-from scripts.urls import generate_link
+from scripts.urls import generate_links
 
-from scripts.process_candidates import ProcessCandidates
+from scripts.data_store import load_csv
 
 import config
 
@@ -37,7 +31,7 @@ class Counts():
         Return HTML table with count of vacant districts
         """
 
-        districts = pd.read_csv('data/districts.csv')
+        districts = load_csv('data/districts.csv')
         districts = districts[districts.redistricting_year == config.current_redistricting_year].copy()
 
         commissioners = list_commissioners(status='current')
@@ -60,13 +54,13 @@ class Counts():
     def contested_count_by_grouping(self, groupby_field):
         """Count of districts by number of candidates by ward or ANC"""
 
-        districts = pd.read_csv('data/districts.csv')
+        districts = load_csv('data/districts.csv')
         districts = districts[districts.redistricting_year == config.current_redistricting_year].copy()
-        ancs = pd.read_csv('data/ancs.csv')
-        wards = pd.read_csv('data/wards.csv')
+        ancs = load_csv('data/ancs.csv')
+        wards = load_csv('data/wards.csv')
         
-        ancs['anc_link'] = ancs.apply(lambda x: generate_link(x.anc_id, x.anc_name, link_source='root'), axis=1)
-        wards['ward_link'] = wards.apply(lambda x: generate_link(x.ward_id, x.ward_name, link_source='root'), axis=1)
+        ancs['anc_link'] = generate_links(ancs.anc_id, ancs.anc_name, link_source='root')
+        wards['ward_link'] = generate_links(wards.ward_id, wards.ward_name, link_source='root')
 
         districts = pd.merge(districts, ancs[['anc_id', 'anc_link']], how='inner', on='anc_id')
         districts = pd.merge(districts, wards[['ward_id', 'ward_link']], how='inner', on='ward_id')
@@ -97,22 +91,27 @@ class Counts():
         cand_count.index.name = ''
         cand_count.columns.name = ''
         
-        html = (
+        html = html_table(
             cand_count
-            .style
-            .format({'Percent Unfilled': '{:.1%}'.format})
-            .applymap(lambda x: 'background: yellow' if x >= 0.5 else '', subset='Percent Unfilled')
-            .set_uuid(f'cand_count_{groupby_field}_')
-            .to_html()
+            , formats={'Percent Unfilled': '{:.1%}'.format}
+            , highlight={'Percent Unfilled': lambda x: x >= 0.5}
+            , show_index=True
             )
 
         return html
 
 
 
+    def results_year(self):
+        """Return the most recent election year with results"""
+
+        return load_csv('data/dcboe/smd_turnout.csv').election_year.max()
+
+
+
     def smd_vote_counts(self, groupby_field, bar_color):
         """
-        Count the number of votes in each grouping
+        Count the number of votes, turnout and under votes in each grouping, in the most recent election
         """
 
         divo = assemble_divo()
@@ -123,29 +122,42 @@ class Counts():
 
 
         if groupby_field == 'dc':
-
             divo['District'] = 'DC'
+            groupby_field = 'District'
+
+        smd_count = divo.groupby(groupby_field).agg(
+            num_smds = ('smd_id', 'count')
+            , total_votes = ('votes', 'sum')
+            , registered_voters = ('registered_voters', 'sum')
+            , ballots_cast = ('ballots_cast', 'sum')
+            , ballots = ('ballots', 'sum')
+            , under_votes = ('under_votes', 'sum')
+            )
 
-            smd_count = divo.groupby('District').agg(
-                num_smds = ('smd_id', 'count')
-                , total_votes = ('votes', 'sum')
-                )
-
-        else:
+        smd_count['Turnout'] = smd_count['ballots_cast'] / smd_count['registered_voters']
 
-            smd_count = divo.groupby(groupby_field).agg(
-                num_smds = ('smd_id', 'count')
-                , total_votes = ('votes', 'sum')
-                )
+        # Under votes aren't in the results files for every year
+        if divo['under_votes'].notna().any():
+            smd_count['Undervote Rate'] = smd_count['under_votes'] / smd_count['ballots']
 
         smd_count['Average Votes per SMD'] = smd_count['total_votes'] / smd_count['num_smds']
 
-        smd_count = smd_count.reset_index()
+        smd_count = smd_count.reset_index().drop(columns=['registered_voters', 'ballots_cast', 'ballots', 'under_votes'])
 
         if groupby_field == 'anc_id':
-            # Join in the ANC table to get neighborhood names
-            ancs = pd.read_csv('data/ancs.csv')
-            smd_count = pd.merge(smd_count, ancs[['anc_id', 'neighborhoods']], how='inner', on='anc_id')
+            # Join in the ANC table to get names and neighborhoods
+            ancs = load_csv('data/ancs.csv')
+            smd_count = pd.merge(smd_count, ancs[['anc_id', 'anc_name', 'neighborhoods']], how='inner', on='anc_id')
+            smd_count['anc_id'] = (
+                generate_links(smd_count.anc_id, smd_count.anc_name, link_source='root') + ' (' + smd_count.neighborhoods.map(str) + ')'
+                )
+            smd_count = smd_count.drop(columns='anc_name')
+
+        elif groupby_field == 'ward_id':
+            wards = load_csv('data/wards.csv')
+            smd_count = pd.merge(smd_count, wards[['ward_id', 'ward_name']], how='inner', on='ward_id')
+            smd_count['ward_id'] = generate_links(smd_count.ward_id, smd_count.ward_name, link_source='root')
+            smd_count = smd_count.drop(columns='ward_name')
 
         smd_count.rename(columns={
             'ward_id': 'Ward'
@@ -155,21 +167,18 @@ class Counts():
             }, inplace=True
             )
 
-        if 'Ward' in smd_count.columns:
-            smd_count['Ward'] = smd_count['Ward'].apply(lambda row: '<a href="wards/ward{0}.html">Ward {0}</a>'.format(row))
-            first_column = 'Ward'
-        elif 'ANC' in smd_count.columns:
-            smd_count['ANC'] = smd_count.apply(
-                lambda row: '<a href="ancs/anc{0}.html">ANC {1}</a> ({2})'.format(row['ANC'].lower(), row['ANC'], row['neighborhoods'])
-                , axis=1
-                )
-            first_column = 'ANC'
-        else:
-            first_column = 'District'
-        
+        first_column = {'ward_id': 'Ward', 'anc_id': 'ANC'}.get(groupby_field, 'District')
+
         # Remove the 'neighborhoods' field from display, keep all others
         fields_to_html = [c for c in list(smd_count.columns) if c != 'neighborhoods']
 
+        value_formats = {
+            'Total ANC Votes': '{:,.0f}'
+            , 'Turnout': '{:.1%}'
+            , 'Undervote Rate': '{:.1%}'
+            , 'Average Votes per SMD': '{:,.1f}'
+            }
+
         smd_html = (
             smd_count[fields_to_html].style
                 .set_properties(
@@ -183,10 +192,10 @@ class Counts():
                         , 'width': '700px'
                         }
                     )
-                .format({
-                    'Total ANC Votes': '{:,.0f}'
-                    , 'Average Votes per SMD': '{:,.1f}'
-                    })
+                .format(
+                    {c: f for c, f in value_formats.items() if c in fields_to_html}
+                    , na_rep=''
+                    )
                 .bar(
                     subset=['Average Votes per SMD']
                     , color=bar_color
@@ -211,7 +220,7 @@ class Counts():
 
         df['has_candidate'] = df['number_of_candidates'] > 0
 
-        districts = pd.read_csv('data/districts.csv')
+        districts = load_csv('data/districts.csv')
         dfd = pd.merge(df, districts, how='inner', on='smd_id')
 
         if groupby_field == 'dc':
@@ -357,7 +366,7 @@ class Counts():
         """
 
         candidates = list_candidates()
-        statuses = pd.read_csv('data/candidate_statuses.csv')
+        statuses = load_csv('data/candidate_statuses.csv')
 
         candidate_statuses = pd.merge(candidates, statuses, how='inner', on='candidate_status')
 
@@ -399,7 +408,7 @@ class Counts():
         Table showing candidates picking up and filing by date
         """
 
-        df = pd.read_csv('data/dcboe/candidates_dcboe.csv')
+        df = load_csv('data/dcboe/candidates_dcboe.csv')
 
         p = pd.DataFrame(df[df['pickup_date'] != 'unknown pickup date'].groupby('pickup_date').size(), columns=['Candidates Picked Up'])
         p['Candidates Picked Up Running Total'] = p['Candidates Picked Up'].cumsum()
@@ -462,6 +471,13 @@ class Counts():
         comparing the current election year with the previous cycle.
         """
 
+        # Imported here because matplotlib and ProcessCandidates (which needs the Google API clients)
+        # are slow to load, and only this plot uses them
+        import matplotlib as mpl
+        from matplotlib import rc
+        import matplotlib.pyplot as plt
+        from scripts.process_candidates import ProcessCandidates
+
         years = [config.current_election_year - 2, config.current_election_year]
 
         pc = ProcessCandidates()
@@ -469,7 +485,7 @@ class Counts():
         # Set the font to Helvetica
         rc('font',**{'family':'sans-serif','sans-serif':['Helvetica']})
 
-        election_dates = pd.read_csv('data/election_dates.csv')
+        election_dates = load_csv('data/election_dates.csv')
         election_dates.set_index('election_year', inplace=True)
 
         for c in election_dates.columns:
@@ -0,0 +1,206 @@
+"""
+Shared in-process store for the CSV tables in data/
+
+build_site.py creates one DataStore per run and activates it with use_data_store().
+From then on, every call to load_csv() for the same file is served from memory instead
+of parsing the CSV again. Without an active DataStore, load_csv() reads from disk every time,
+which is what notebooks and one-off scripts get by default.
+
+Underneath the in-memory store, each CSV also has a binary copy in data/.cache/, written
+in the Feather format with the dtypes pandas inferred from the CSV. As long as the content
+hash of the CSV has not changed, the binary copy is memory-mapped instead of parsing the CSV.
+The binary cache needs pyarrow. Without it, every CSV is parsed as usual.
+"""
+
+import os
+import hashlib
+import tempfile
+import pandas as pd
+from pathlib import Path
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+
+class DataStore():
+
+    def __init__(self):
+
+        # Keyed by normalized CSV path. Value is a tuple of (file version, DataFrame)
+        self.tables = {}
+
+
+
+    def load_csv(self, csv_path):
+        """
+        Return the table stored in csv_path, parsing the file only on first access.
+
+        Each caller gets a copy, so the frame held by the store stays read-only
+        no matter what the caller does to it.
+
+        The file's modification time and size are checked on every access, so a CSV that
+        is rewritten during a build (for instance by RefreshData) is parsed again.
+        """
+
+        csv_path = os.path.normpath(csv_path)
+        version = file_version(csv_path)
+
+        if csv_path not in self.tables or self.tables[csv_path][0] != version:
+            self.tables[csv_path] = (version, read_csv_cached(csv_path))
+
+        return self.tables[csv_path][1].copy()
+
+
+
+    def clear(self):
+        """Drop every table from memory"""
+
+        self.tables = {}
+
+
+
+def file_version(file_path):
+    """Return a tuple that changes whenever the file at file_path is rewritten"""
+
+    stat = os.stat(file_path)
+
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+
+active_data_store = None
+
+
+
+def use_data_store(data_store):
+    """
+    Make data_store the store that load_csv() reads from. Pass None to go back to reading from disk.
+    """
+
+    global active_data_store
+    active_data_store = data_store
+
+
+
+def load_csv(csv_path):
+    """
+    Return a DataFrame of the CSV at csv_path, from the active DataStore if there is one
+    """
+
+    if active_data_store is None:
+        return read_csv_cached(csv_path)
+
+    return active_data_store.load_csv(csv_path)
+
+
+
+cache_dir = Path('data/.cache')
+
+
+
+def file_digest(file_path):
+    """Return the SHA-224 hash of the contents of a file"""
+
+    digest = hashlib.sha224()
+
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+
+def in_data_dir(csv_path):
+    """Only CSVs under data/ get a binary copy"""
+
+    return Path(os.path.normpath(csv_path)).parts[0] == cache_dir.parts[0]
+
+
+
+def cache_file_stem(csv_path):
+    """Name shared by every binary copy of one CSV, such as 'data__dcboe__candidate_votes'"""
+
+    return os.path.splitext(os.path.normpath(csv_path))[0].replace(os.sep, '__')
+
+
+
+def cache_file_path(csv_path, digest):
+    """Path of the binary copy of csv_path for one version of its contents"""
+
+    return cache_dir / f'{cache_file_stem(csv_path)}-{digest}.feather'
+
+
+
+def read_csv_cached(csv_path):
+    """
+    Return a DataFrame of the CSV at csv_path, reading the binary copy in data/.cache/ if it is current.
+
+    If there is no current binary copy, the CSV is parsed and a binary copy is written for next time.
+    A binary copy that can't be read, such as one removed by another process in the meantime, also falls back to the CSV.
+    """
+
+    if feather is None or not in_data_dir(csv_path):
+        return pd.read_csv(csv_path)
+
+    digest = file_digest(csv_path)
+    feather_path = cache_file_path(csv_path, digest)
+
+    if feather_path.exists():
+        try:
+            return feather.read_table(feather_path, memory_map=True).to_pandas()
+        except (OSError, ValueError) as e:
+            print(f'Binary cache not read for {csv_path}: {e}')
+            return pd.read_csv(csv_path)
+
+    df = pd.read_csv(csv_path)
+    write_csv_cache(csv_path, df, digest)
+
+    return df
+
+
+
+def write_csv_cache(csv_path, df=None, digest=None):
+    """
+    Save a binary copy of the CSV at csv_path to data/.cache/, replacing any older copies of the same CSV.
+
+    df should be the result of pd.read_csv(csv_path). If it isn't passed, the CSV is parsed here, so that
+    the binary copy keeps exactly the dtypes a reader of the CSV would get.
+
+    Tables that can't be stored in Feather, such as object columns mixing numbers and strings,
+    are left uncached. They are parsed from the CSV every time.
+
+    Build workers can write the same copy at the same time, so the file is written under a temporary name
+    and moved into place in one step. A reader never sees a half-written copy.
+    """
+
+    if feather is None or not in_data_dir(csv_path):
+        return
+
+    if df is None:
+        df = pd.read_csv(csv_path)
+
+    if not digest:
+        digest = file_digest(csv_path)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    feather_path = cache_file_path(csv_path, digest)
+
+    temp_fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=f'{cache_file_stem(csv_path)}-', suffix='.tmp')
+    os.close(temp_fd)
+
+    try:
+        # Uncompressed, so the file can be memory-mapped without decoding
+        feather.write_feather(df, temp_path, compression='uncompressed')
+        os.replace(temp_path, feather_path)
+    except (TypeError, ValueError, OSError) as e:
+        print(f'Binary cache not written for {csv_path}: {e}')
+        Path(temp_path).unlink(missing_ok=True)
+
+    for old_file in cache_dir.glob(f'{cache_file_stem(csv_path)}-*.feather'):
+        if old_file != feather_path:
+            old_file.unlink(missing_ok=True)
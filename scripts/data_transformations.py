@@ -6,10 +6,16 @@ import pytz
 import numpy as np
 import pandas as pd
 from datetime import datetime
+from functools import lru_cache
 
 import config
+
+from scripts.data_store import (
+    load_csv
+    , file_version
+    )
 from scripts.urls import (
-    generate_link
+    generate_links
     )
 
 
@@ -20,12 +26,12 @@ def results_candidate_people():
     """
 
     people = people_dataframe()
-    candidates = pd.read_csv('data/candidates.csv')
-    lookup = pd.read_csv('data/external_id_lookup.csv').drop('full_name', axis=1)
-    election_dates = pd.read_csv('data/election_dates.csv')
+    candidates = load_csv('data/candidates.csv')
+    lookup = load_csv('data/external_id_lookup.csv').drop('full_name', axis=1)
+    election_dates = load_csv('data/election_dates.csv')
     commissioners = list_commissioners(status=None)
 
-    results = pd.read_csv('data/dcboe/candidate_votes.csv')
+    results = load_csv('data/dcboe/candidate_votes.csv')
 
     # format percentages as strings
     results['vote_share'] = results['vote_share'].apply(lambda x: pd.NA if pd.isnull(x) else f'{x:.2%}')
@@ -85,18 +91,18 @@ def results_candidate_people():
 def incumbent_df():
     """DataFrame showing re-election status of every incumbent"""
 
-    districts = pd.read_csv('data/districts.csv')
-    people = pd.read_csv('data/people.csv')
+    districts = load_csv('data/districts.csv')
+    people = load_csv('data/people.csv')
     comm = list_commissioners(status='current')
     comm.rename(columns={'smd_id': 'commissioner_smd_id'}, inplace=True)
     pc = pd.merge(people[['person_id', 'full_name']], comm, how='inner', on='person_id')
 
     candidates = list_candidates(election_year=config.current_election_year)
-    candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+    candidate_statuses = load_csv('data/candidate_statuses.csv')
     candidates = pd.merge(candidates, candidate_statuses, how='inner', on='candidate_status')
     candidates.rename(columns={'smd_id': 'candidate_smd_id'}, inplace=True)
 
-    not_running = pd.read_csv('data/incumbents_not_running.csv')
+    not_running = load_csv('data/incumbents_not_running.csv')
     not_running['confirmed_not_running'] = True
             
     comm_candidates = pd.merge(
@@ -123,15 +129,15 @@ def incumbent_df():
     comm_candidates_nrd = pd.merge(comm_candidates_nr, districts.rename(columns={'smd_name': 'commissioner_smd_name'}), how='left', left_on='commissioner_smd_id', right_on='smd_id')
     comm_candidates_nrd = pd.merge(comm_candidates_nrd, districts.rename(columns={'smd_name': 'candidate_smd_name'}), how='left', left_on='candidate_smd_id', right_on='smd_id')
 
-    comm_candidates_nrd['Incumbent SMD'] = comm_candidates_nrd.apply(lambda x: 
-        generate_link(x.commissioner_smd_id, link_source='root', link_body=x.commissioner_smd_name)
-        , axis=1
-    )
-    comm_candidates_nrd[f'{config.current_election_year} Candidate SMD'] = comm_candidates_nrd.apply(lambda x:
-        '(none)' if pd.isnull(x.candidate_smd_id) else
-        generate_link(x.candidate_smd_id, link_source='root', link_body=x.candidate_smd_name)
-        , axis=1
-    )
+    comm_candidates_nrd['Incumbent SMD'] = generate_links(
+        comm_candidates_nrd.commissioner_smd_id, comm_candidates_nrd.commissioner_smd_name, link_source='root'
+        )
+
+    has_candidate_smd = comm_candidates_nrd.candidate_smd_id.notnull()
+    comm_candidates_nrd[f'{config.current_election_year} Candidate SMD'] = '(none)'
+    comm_candidates_nrd.loc[has_candidate_smd, f'{config.current_election_year} Candidate SMD'] = generate_links(
+        comm_candidates_nrd.candidate_smd_id[has_candidate_smd], comm_candidates_nrd.candidate_smd_name[has_candidate_smd], link_source='root'
+        )
 
     comm_candidates_nrd['candidate_smd_id'] = comm_candidates_nrd['candidate_smd_id'].fillna('(none)')
 
@@ -147,70 +153,122 @@ def districts_candidates_commissioners(link_source=None, redistricting_year=None
 
     Technically there can't be candidates and commissioners-elect at the same time,
     but I'm putting them in the same function for cohesion.
+
+    The joins are done once per version of the input tables, in districts_candidates_commissioners_core(),
+    and the links for each link_source are added to that once. Every later call for the same link_source
+    returns a copy of the saved result.
     """
 
-    districts = pd.read_csv('data/districts.csv')
-    candidates = list_candidates(election_year=config.current_election_year)
-    commissioners = list_commissioners(status=None)
-    candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+    district_info_comm, output_columns = districts_candidates_commissioners_links(link_source, dcc_inputs_version())
 
-    people = people_dataframe()
-    
-    if link_source:
-        # create links for each person's page, if a link is requested by the calling function
-        people['name_link'] = people.apply(lambda x: generate_link(x.person_name_id, link_source=link_source, link_body=x.full_name), axis=1)
-    else:
-        people['name_link'] = 'x'
+    if redistricting_year:
+        district_info_comm = district_info_comm[district_info_comm.redistricting_year == redistricting_year]
+
+    return district_info_comm[output_columns].copy()
 
-    candidate_people = pd.merge(candidates, people, how='inner', on='person_id')
-    candidate_people.rename(columns={'name_link': 'name_link_candidate'}, inplace=True)
-    candidate_people_status = pd.merge(candidate_people, candidate_statuses, how='inner', on='candidate_status')
 
-    # Randomly shuffle the order of candidates in this DataFrame, and thus the resulting lists
-    candidate_people_status = candidate_people_status.sample(frac=1, random_state=today_as_int()).reset_index()
 
+def dcc_inputs_version():
     """
-    Group candidates by district so that each row has a string containing
-    all candidates for that district. Only include active candidates.
+    Return tuple that changes whenever any input of districts_candidates_commissioners() changes:
+    one of its CSVs, the current election year, or the date, which sets candidate order and commissioner status
     """
 
-    candidates_by_district = candidate_people_status[candidate_people_status['count_as_candidate']].groupby('smd_id').agg({
-        'name_link_candidate': list
-        , 'candidate_name': list
-        , 'candidate_id': 'count'
-        }).reset_index()
+    csv_files = ['data/districts.csv', 'data/candidates.csv', 'data/commissioners.csv', 'data/candidate_statuses.csv', 'data/people.csv']
+
+    return tuple(file_version(f) for f in csv_files) + (config.current_election_year, today_as_int())
+
 
-    district_candidates = pd.merge(districts, candidates_by_district, how='left', on='smd_id')
 
+@lru_cache(maxsize=8)
+def districts_candidates_commissioners_links(link_source, inputs_version):
     """
-    Repeat this above grouping for each possible status of candidate, so the statuses can be
-    displayed as different columns in the resulting HTML table.
+    Return tuple of the full districts_candidates_commissioners() DataFrame for one link_source, and its output columns
     """
 
-    active_statuses = sorted(candidate_people_status.display_order.unique())
+    district_info_comm, candidate_people_status, active_statuses = districts_candidates_commissioners_core(inputs_version)
+    district_info_comm = district_info_comm.copy()
+
+    candidate_people_status = candidate_people_status.assign(
+        name_link=person_links(candidate_people_status.person_name_id, candidate_people_status.full_name, link_source)
+        )
+
+    active_candidates = candidate_people_status[candidate_people_status['count_as_candidate']]
+    district_info_comm['list_of_candidate_links'] = join_by_smd(
+        active_candidates, 'name_link', district_info_comm.smd_id, '(no known candidates)'
+        )
 
     for s in active_statuses:
-        candidates_in_status_by_district = (
-            candidate_people_status[candidate_people_status.display_order == s]
-            .groupby('smd_id')
-            .agg({
-                'name_link_candidate': list
-                , 'candidate_id': 'count'
-                })
-            .reset_index()
+        district_info_comm[f'list_of_candidates_status_{s}'] = join_by_smd(
+            candidate_people_status[candidate_people_status.display_order == s], 'name_link', district_info_comm.smd_id, ''
+            )
+
+    # Keep the text dtype even when every value is missing, as when there are no commissioners-elect
+    for column in ['current_commissioner', 'commissioner_elect']:
+        district_info_comm[column] = pd.Series(
+            person_links(district_info_comm[f'{column}_person_name_id'], district_info_comm[f'{column}_full_name'], link_source)
+            , index=district_info_comm.index
+            , dtype=district_info_comm['smd_name'].dtype
             )
 
-        candidates_in_status_by_district.rename(columns={
-            'name_link_candidate': f'name_link_candidate_status_{s}'
-            , 'candidate_id': f'number_of_candidates_status_{s}'
-            }, inplace=True)
+    # If there is not a current commissioner for the SMD, mark the row as "vacant"
+    district_info_comm['current_commissioner'] = district_info_comm['current_commissioner'].fillna('(vacant)')
+
+    output_columns = [
+        'smd_id'
+        , 'redistricting_year'
+        , 'smd_name'
+        , 'map_color_id'
+        , 'list_of_candidate_names'
+        , 'list_of_candidate_links'
+        , 'number_of_candidates'
+        , 'current_commissioner'
+        , 'commissioner_elect'
+    ]
+
+    for s in active_statuses:
+        output_columns += [f'list_of_candidates_status_{s}']
+
+    return district_info_comm, output_columns
+
+
+
+@lru_cache(maxsize=1)
+def districts_candidates_commissioners_core(inputs_version):
+    """
+    Return tuple of a DataFrame with one row per district, the candidates in random order, and the list of active candidate statuses
+
+    This is the part of districts_candidates_commissioners() that doesn't depend on link_source.
+    Candidates and commissioners are kept as a person_name_id and full_name, to be turned into links later.
+    """
 
-        columns_to_merge = ['smd_id', f'name_link_candidate_status_{s}', f'number_of_candidates_status_{s}']
+    districts = load_csv('data/districts.csv')
+    candidates = list_candidates(election_year=config.current_election_year)
+    commissioners = list_commissioners(status=None)
+    candidate_statuses = load_csv('data/candidate_statuses.csv')
 
-        district_candidates = pd.merge(district_candidates, candidates_in_status_by_district[columns_to_merge], how='left', on='smd_id')
+    people = people_dataframe()[['person_id', 'person_name_id', 'full_name']]
 
+    candidate_people = pd.merge(candidates, people, how='inner', on='person_id')
+    candidate_people_status = pd.merge(candidate_people, candidate_statuses, how='inner', on='candidate_status')
 
+    # Randomly shuffle the order of candidates in this DataFrame, and thus the resulting lists
+    candidate_people_status = candidate_people_status.sample(frac=1, random_state=today_as_int()).reset_index()
 
+    """
+    Join candidates by district so that each row has a string containing
+    all candidates for that district. Only include active candidates.
+    """
+
+    active_candidates = candidate_people_status[candidate_people_status['count_as_candidate']]
+
+    district_info_comm = districts.copy()
+    district_info_comm['list_of_candidate_names'] = join_by_smd(
+        active_candidates, 'candidate_name', district_info_comm.smd_id, '(no known candidates)'
+        )
+    district_info_comm['number_of_candidates'] = (
+        district_info_comm.smd_id.map(active_candidates.groupby('smd_id').size()).fillna(0).astype(int)
+        )
 
     """
     Add current and future commissioners to the district DataFrame
@@ -218,55 +276,50 @@ def districts_candidates_commissioners(link_source=None, redistricting_year=None
 
     commissioner_people = pd.merge(commissioners, people, how='inner', on='person_id')
 
-    comm_columns = ['smd_id', 'name_link']
-    comm_temp = pd.merge(district_candidates, commissioner_people[commissioner_people.is_current][comm_columns], how='left', on='smd_id')
-    comm_temp.rename(columns={'name_link': 'name_link_commissioner'}, inplace=True)
+    for column, is_status in [('current_commissioner', 'is_current'), ('commissioner_elect', 'is_future')]:
+        commissioners_in_status = commissioner_people[commissioner_people[is_status]][['smd_id', 'person_name_id', 'full_name']]
+        commissioners_in_status = commissioners_in_status.rename(columns={
+            'person_name_id': f'{column}_person_name_id'
+            , 'full_name': f'{column}_full_name'
+            })
 
-    district_info_comm = pd.merge(comm_temp, commissioner_people[commissioner_people.is_future][comm_columns], how='left', on='smd_id')
-    district_info_comm.rename(columns={'name_link': 'name_link_commissioner_elect'}, inplace=True)
+        district_info_comm = pd.merge(district_info_comm, commissioners_in_status, how='left', on='smd_id')
 
+    active_statuses = sorted(candidate_people_status.display_order.unique())
 
-    # todo: use the new agg() format to obviate this
-    district_info_comm.rename(columns={
-        'name_link_commissioner': 'current_commissioner'
-        , 'name_link_commissioner_elect': 'commissioner_elect'
-        , 'candidate_name': 'list_of_candidate_names_to_join'
-        , 'name_link_candidate': 'list_of_candidate_links_to_join'
-        , 'candidate_id': 'number_of_candidates'
-        }, inplace=True)
+    return district_info_comm, candidate_people_status, active_statuses
 
-    district_info_comm['number_of_candidates'] = district_info_comm['number_of_candidates'].fillna(0)
 
-    # If there is not a current commissioner for the SMD, mark the row as "vacant"
-    district_info_comm['current_commissioner'] = district_info_comm['current_commissioner'].fillna('(vacant)')
 
-    district_info_comm['list_of_candidate_names'] = district_info_comm.apply(lambda x: ', '.join(x.list_of_candidate_names_to_join) if x.number_of_candidates > 0 else '(no known candidates)', axis=1)
-    district_info_comm['list_of_candidate_links'] = district_info_comm.apply(lambda x: ', '.join(x.list_of_candidate_links_to_join) if x.number_of_candidates > 0 else '(no known candidates)', axis=1)
+def person_links(person_name_ids, full_names, link_source):
+    """
+    Return Series with a link to the page of each person, or 'x' for each person if there is no link_source
 
-    for s in active_statuses:
-        district_info_comm[f'list_of_candidates_status_{s}'] = district_info_comm.apply(lambda x: ', '.join(x[f'name_link_candidate_status_{s}']) if x[f'number_of_candidates_status_{s}'] > 0 else '', axis=1)
+    Missing people stay missing.
+    """
 
-    district_info_comm['number_of_candidates'] = district_info_comm['number_of_candidates'].astype(int)
+    links = pd.Series(np.nan, index=person_name_ids.index, dtype=object)
+    has_person = person_name_ids.notna()
 
-    if redistricting_year:
-        district_info_comm = district_info_comm[district_info_comm.redistricting_year == redistricting_year].copy()
+    if link_source:
+        links[has_person] = generate_links(person_name_ids[has_person], full_names[has_person], link_source=link_source)
+    else:
+        links[has_person] = 'x'
 
-    output_columns = [
-        'smd_id'
-        , 'redistricting_year'
-        , 'smd_name'
-        , 'map_color_id'
-        , 'list_of_candidate_names'
-        , 'list_of_candidate_links'
-        , 'number_of_candidates'
-        , 'current_commissioner'
-        , 'commissioner_elect'
-    ]
+    return links
 
-    for s in active_statuses:
-        output_columns += [f'list_of_candidates_status_{s}']
 
-    return district_info_comm[output_columns]
+
+def join_by_smd(df, column, smd_ids, empty_value):
+    """
+    Return Series with the values of column in df joined with commas for each of smd_ids, in the order they appear in df
+
+    SMDs without any rows in df get empty_value. The result has the text dtype of smd_ids even if df is empty.
+    """
+
+    joined = df.groupby('smd_id', sort=False)[column].agg(', '.join)
+
+    return smd_ids.map(joined).fillna(empty_value).astype(smd_ids.dtype)
 
 
 
@@ -289,51 +342,125 @@ def list_commissioners(status=None, date_point=None):
     date_point=(some other datetime) -- all statuses calculated from that datetime
     """
 
-    if status and status not in ('former', 'current', 'future'):
-        raise ValueError(f'Commissioner status "{status}" is not valid. Must be: "former", "current", or "future"')
+    return commissioner_timeline().list_commissioners(status=status, date_point=date_point)
 
-    commissioners = pd.read_csv('data/commissioners.csv')
 
-    if not date_point:
-        date_point = datetime.now(pytz.timezone(config.site_timezone))
 
-    commissioners['start_date'] = pd.to_datetime(commissioners['start_date']).dt.tz_localize(tz=config.site_timezone)
-    commissioners['end_date'] = pd.to_datetime(commissioners['end_date']).dt.tz_localize(tz=config.site_timezone)
+class CommissionerTimeline():
+    """
+    Commissioners table with its dates parsed and formatted once, for answering status queries at any point in time
 
-    # Create combined field with start and end dates, showing ambiguity
-    commissioners['start_date_str'] = commissioners['start_date'].dt.strftime('%B %-d, %Y')
-    commissioners['end_date_str'] = commissioners['end_date'].dt.strftime('%B %-d, %Y')
+    The start and end of every term are kept as int64 arrays of nanoseconds since the epoch, so the status
+    of every commissioner at a date_point is a few vectorized comparisons.
+    """
 
-    # We don't have exact dates when these commissioners started, so show "circa 2019"
-    commissioners.loc[commissioners['start_date_str'] == 'January 2, 2019', 'start_date_str'] = '~2019'
+    def __init__(self, commissioners):
 
-    # Combine start and end dates into one field
-    commissioners['term_in_office'] = commissioners['start_date_str'] + ' to ' + commissioners['end_date_str']
+        commissioners['start_date'] = pd.to_datetime(commissioners['start_date']).dt.tz_localize(tz=config.site_timezone)
+        commissioners['end_date'] = pd.to_datetime(commissioners['end_date']).dt.tz_localize(tz=config.site_timezone)
 
-    commissioners['is_former'] = commissioners.end_date < date_point
-    commissioners['is_current'] = (commissioners.start_date < date_point) & (date_point < commissioners.end_date)
-    commissioners['is_future'] = date_point < commissioners.start_date
+        # Create combined field with start and end dates, showing ambiguity
+        commissioners['start_date_str'] = commissioners['start_date'].dt.strftime('%B %-d, %Y')
+        commissioners['end_date_str'] = commissioners['end_date'].dt.strftime('%B %-d, %Y')
 
-    # Test here that there is, at most, one "Current" and one "Future" commissioner per SMD. 
-    # Multiple "Former" commissioners is allowed
-    smd_count = commissioners.groupby('smd_id')[['is_former', 'is_current', 'is_future']].sum().astype(int)
-    
-    fields_to_check = ['is_current', 'is_future']
+        # We don't have exact dates when these commissioners started, so show "circa 2019"
+        commissioners.loc[commissioners['start_date_str'] == 'January 2, 2019', 'start_date_str'] = '~2019'
 
-    for f in fields_to_check:
-        if smd_count[f].max() > 1:
-            print('Problem SMDs:')
-            print(smd_count[smd_count[f] > 1])
-            
-            raise Exception('Too many commissioners per SMD')
+        # Combine start and end dates into one field
+        commissioners['term_in_office'] = commissioners['start_date_str'] + ' to ' + commissioners['end_date_str']
+
+        self.commissioners = commissioners
+
+        # Missing dates never compare as before or after anything, same as NaT
+        self.has_start = commissioners['start_date'].notna().to_numpy()
+        self.has_end = commissioners['end_date'].notna().to_numpy()
+        self.start_ns = epoch_ns(commissioners['start_date'])
+        self.end_ns = epoch_ns(commissioners['end_date'])
+
+        self.smd_codes, self.smd_ids = pd.factorize(commissioners['smd_id'])
+
+        # Keyed by status and the status arrays. Value is the DataFrame returned by list_commissioners
+        self.outputs = {}
+
+
+
+    def statuses(self, date_point):
+        """Return dict of boolean arrays is_former, is_current and is_future, for each commissioner at date_point"""
+
+        date_point_ns = pd.Timestamp(date_point).value
+
+        return {
+            'is_former': self.has_end & (self.end_ns < date_point_ns)
+            , 'is_current': self.has_start & self.has_end & (self.start_ns < date_point_ns) & (date_point_ns < self.end_ns)
+            , 'is_future': self.has_start & (date_point_ns < self.start_ns)
+            }
+
+
+
+    def list_commissioners(self, status=None, date_point=None):
+        """Return DataFrame of the commissioners, with their status at date_point. See list_commissioners()"""
+
+        if status and status not in ('former', 'current', 'future'):
+            raise ValueError(f'Commissioner status "{status}" is not valid. Must be: "former", "current", or "future"')
+
+        if not date_point:
+            date_point = datetime.now(pytz.timezone(config.site_timezone))
+
+        statuses = self.statuses(date_point)
+
+        # Statuses only change when a term starts or ends, so most date_points give the same
+        # statuses as an earlier call and the output from that call can be reused
+        statuses_key = (status, b''.join(statuses[f].tobytes() for f in ['is_former', 'is_current', 'is_future']))
+
+        if statuses_key not in self.outputs:
+            self.outputs[statuses_key] = self.build_output(statuses, status)
+
+        return self.outputs[statuses_key].copy()
+
+
+
+    def build_output(self, statuses, status):
+        """Return DataFrame of the commissioners with the given status arrays, filtered to one status"""
+
+        # Test here that there is, at most, one "Current" and one "Future" commissioner per SMD. 
+        # Multiple "Former" commissioners is allowed
+        for f in ['is_current', 'is_future']:
+            per_smd = np.bincount(self.smd_codes[statuses[f]], minlength=len(self.smd_ids))
+
+            if per_smd.max(initial=0) > 1:
+                print('Problem SMDs:')
+                print(pd.Series(per_smd, index=self.smd_ids, name=f)[per_smd > 1])
+
+                raise Exception('Too many commissioners per SMD')
+
+        commissioner_output = self.commissioners.assign(**statuses)
+
+        if status:
+            commissioner_output = commissioner_output[statuses['is_' + status]].copy()
+
+        return commissioner_output
+
+
+
+def epoch_ns(dates):
+    """Return int64 array of nanoseconds since the epoch, in UTC, for a Series of timezone-aware datetimes"""
+
+    return dates.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[ns]').astype('int64')
+
+
+
+def commissioner_timeline():
+    """
+    Return the CommissionerTimeline of data/commissioners.csv, built once for each version of the file
+    """
+
+    return commissioner_timeline_for_version(file_version('data/commissioners.csv'))
 
 
-    if status:
-        commissioner_output = commissioners[commissioners['is_' + status]].copy()
-    else:
-        commissioner_output = commissioners.copy()
 
-    return commissioner_output
+@lru_cache(maxsize=1)
+def commissioner_timeline_for_version(version):
+    return CommissionerTimeline(load_csv('data/commissioners.csv'))
 
 
 
@@ -345,7 +472,7 @@ def list_candidates(election_year=config.current_election_year):
     election_year=None : return candidates from all years
     """
 
-    candidates = pd.read_csv('data/candidates.csv')
+    candidates = load_csv('data/candidates.csv')
 
     if election_year:
         candidates_year = candidates[candidates.election_year == election_year].copy()
@@ -359,7 +486,7 @@ def list_candidates(election_year=config.current_election_year):
 def people_dataframe():
     """Return dataframe of people.csv with the name URLs added."""
 
-    people = pd.read_csv('data/people.csv')
+    people = load_csv('data/people.csv')
     # people['name_slug'] = people.full_name.apply(lambda x: format_name_for_url(x))
 
     return people
@@ -404,7 +531,7 @@ def today_as_int():
 def confirm_key_uniqueness(table_filename, primary_key):
     """Throw an error if a primary key exists more than once in a table"""
 
-    df = pd.read_csv(table_filename)
+    df = load_csv(table_filename)
     key_count = df.groupby(primary_key).size()
 
     if any(key_count > 1):
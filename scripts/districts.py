@@ -6,30 +6,36 @@ import sys
 import pytz
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import geopandas as gpd
 from datetime import datetime
 from collections import OrderedDict
 
 import config
 
+from scripts.data_store import load_csv
+from scripts.template import load_template
+from scripts.precinct_votes import PrecinctVotes
+
 from scripts.common import (
     build_district_list
     , build_data_table
     , build_link_block
-    , add_footer
-    , add_google_analytics
-    , add_geojson
+    , footer_html
+    , google_analytics_html
+    , shape_bounds
+    , html_table
     , assemble_divo
     , mapbox_slugs
     , candidate_form_link
-    , smd_geojson
     , in_election_season
+    , districts_current_commissioners
+    , group_rows
+    , build_pages
+    , write_html
     )
 
 from scripts.urls import (
     generate_url
-    , generate_link
+    , generate_links
     )
 
 
@@ -47,25 +53,25 @@ class BuildDistricts():
 
     def __init__(self):
 
-        self.smd_shape = smd_geojson()
+        self.smd_bounds = shape_bounds('smd')
 
         self.mapbox_style_slugs = mapbox_slugs()
 
         self.commissioners = list_commissioners(status=None)
-        self.commissioners_current = list_commissioners(status='current')
         self.people = people_dataframe()
         self.candidates_this_year = list_candidates(election_year=config.current_election_year)
 
         self.rcp = results_candidate_people()
         self.rcp.loc[self.rcp.is_incumbent, 'full_name'] = self.rcp.loc[self.rcp.is_incumbent, 'full_name'] + ' (incumbent)'
+        self.precinct_votes = PrecinctVotes.from_csv()
 
-        self.districts = pd.read_csv('data/districts.csv')
-        write_in_winners = pd.read_csv('data/dcboe/write_in_winners.csv')
-        self.field_names = pd.read_csv('data/field_names.csv')
-        self.ancs = pd.read_csv('data/ancs.csv')
-        self.wards = pd.read_csv('data/wards.csv')
-        self.statuses = pd.read_csv('data/candidate_statuses.csv')
-        lookup = pd.read_csv('data/external_id_lookup.csv').drop('full_name', axis=1)
+        self.districts = load_csv('data/districts.csv')
+        write_in_winners = load_csv('data/dcboe/write_in_winners.csv')
+        self.field_names = load_csv('data/field_names.csv')
+        self.ancs = load_csv('data/ancs.csv')
+        self.wards = load_csv('data/wards.csv')
+        self.statuses = load_csv('data/candidate_statuses.csv')
+        lookup = load_csv('data/external_id_lookup.csv').drop('full_name', axis=1)
 
         self.people_commissioners = pd.merge(self.people, self.commissioners, how='inner', on='person_id')
         write_in_winners_lookup = pd.merge(write_in_winners, lookup, how='inner', on='external_id')
@@ -88,6 +94,17 @@ class BuildDistricts():
         # Shuffle the order of candidates. Changes every day
         self.people_candidate_statuses.sample(frac=1, random_state=today_as_int())
 
+        self.districts_commissioners = districts_current_commissioners()
+
+        # Group every per-district table by smd_id once, so that each page looks up its rows
+        # instead of scanning the whole table for every one of the districts
+        self.districts_by_smd = group_rows(self.districts, 'smd_id')
+        self.districts_commissioners_by_smd = group_rows(self.districts_commissioners, 'smd_id')
+        self.people_commissioners_by_smd = group_rows(self.people_commissioners, 'smd_id')
+        self.rcp_by_smd = group_rows(self.rcp, 'smd_id')
+        self.write_in_winners_people_by_smd = group_rows(self.write_in_winners_people, 'smd_id')
+        self.people_candidate_statuses_by_smd = group_rows(self.people_candidate_statuses, 'smd_id')
+
 
 
     def build_commissioner_table(self, smd_id):
@@ -102,7 +119,11 @@ class BuildDistricts():
             , 'former': 'Former Commissioner'
             })
         
-        smd_commissioners = self.people_commissioners[self.people_commissioners['smd_id'] == smd_id].sort_values(by='start_date', ascending=False).copy()
+        smd_commissioners = (
+            self.people_commissioners_by_smd.get(smd_id, self.people_commissioners.iloc[0:0])
+            .sort_values(by='start_date', ascending=False)
+            .copy()
+            )
 
         vacant_string = '<h2>Current Commissioner</h2><p>This office is vacant.</p>'
         if len(smd_commissioners) == 0:
@@ -161,7 +182,7 @@ class BuildDistricts():
     def add_results(self, smd_id):
         """Add block of information about the results of the election"""
 
-        smd_results_all_years = self.rcp[self.rcp['smd_id'] == smd_id].copy()
+        smd_results_all_years = self.rcp_by_smd.get(smd_id, self.rcp.iloc[0:0]).copy()
 
         results_block = ''
 
@@ -179,6 +200,9 @@ class BuildDistricts():
 
             else:
 
+                # Names to show for each candidate in the precinct table, in the order of the results table
+                display_names = dict(zip(smd_results['candidate_name'], smd_results['full_name']))
+
                 # Add total row
                 smd_results.loc[9999, 'full_name'] = 'Total Votes'
                 smd_results.loc[9999, 'votes'] = smd_results.votes.sum()
@@ -192,10 +216,9 @@ class BuildDistricts():
                     , 'margin_of_victory_percentage'
                 ]
 
-                smd_results['full_name'] = smd_results.apply(
-                    lambda x: generate_link(x.person_name_id, link_source='district', link_body=x.full_name)
-                            if x.full_name not in ['Write-ins combined', 'Total Votes'] else x.full_name
-                    , axis=1
+                is_candidate = ~smd_results.full_name.isin(['Write-ins combined', 'Total Votes'])
+                smd_results.loc[is_candidate, 'full_name'] = generate_links(
+                    smd_results.person_name_id[is_candidate], smd_results.full_name[is_candidate], link_source='district'
                     )
 
                 smd_results['votes'] = smd_results['votes'].apply(lambda x: '{:,.0f}'.format(x)).fillna('')
@@ -206,22 +229,11 @@ class BuildDistricts():
                     smd_results[display_name] = smd_results[field_name]
                     fields_to_html += [display_name]
 
-                results_block += (
-                    smd_results[fields_to_html]
-                    .fillna('')
-                    .style
-                    .set_properties(**{'text-align': 'right'})
-                    .set_properties(
-                        subset=['Name']
-                        , **{'text-align': 'left'}
-                        )
-                    .apply(
-                        lambda x: ['font-weight: bold' if x.Name == 'Total Votes' else '' for i in x]
-                        , axis=1
-                        )
-                    .set_uuid(f'results_{election_year}_')
-                    .hide(axis='index')
-                    .to_html()
+                # The total row was added last
+                results_block += html_table(
+                    smd_results[fields_to_html].fillna('')
+                    , align={c: 'left' if c == 'Name' else 'right' for c in fields_to_html}
+                    , bold_last_row=True
                     )
 
                 if election_year == 2022 and smd_id in ('smd_2022_1E01', 'smd_2022_6E08', 'smd_2022_7D10'):
@@ -233,12 +245,12 @@ class BuildDistricts():
 
                     # If there is a write-in winner, include their name here. Otherwise, no one won and the district will be vacant.
 
-                    if ((self.write_in_winners_people.smd_id == smd_id) & (self.write_in_winners_people.election_year == election_year)).sum() > 0:
+                    smd_write_in_winners = self.write_in_winners_people_by_smd.get(smd_id, self.write_in_winners_people.iloc[0:0])
+                    write_in_winners_in_year = smd_write_in_winners[smd_write_in_winners.election_year == election_year]
 
-                        if len(self.write_in_winners_people[(self.write_in_winners_people.smd_id == smd_id) & (self.write_in_winners_people.election_year == election_year)]['full_name']) == 0:
-                            print(smd_id)
-                            print(election_year)
-                        commissioner_elect = self.write_in_winners_people[(self.write_in_winners_people.smd_id == smd_id) & (self.write_in_winners_people.election_year == election_year)]['full_name'].values[0]
+                    if len(write_in_winners_in_year) > 0:
+
+                        commissioner_elect = write_in_winners_in_year['full_name'].values[0]
 
                         results_block += (
                             f'<p>This election was won by <strong>{commissioner_elect}</strong>, a write-in candidate whose "Affirmation of Write-in Candidacy" was accepted by the DC Board of Elections.</p>'
@@ -246,7 +258,7 @@ class BuildDistricts():
 
                     else:
 
-                        smd_name = self.districts[self.districts['smd_id'] == smd_id]['smd_name'].iloc[0]
+                        smd_name = self.districts_by_smd[smd_id]['smd_name'].iloc[0]
 
                         if election_year == 2022 and smd_id in ('smd_2022_3E07', 'smd_2022_6E02'):
                             results_block += ('<p>Two write-in candidates tied in this election. See "Notes" below.</p>')
@@ -260,11 +272,44 @@ class BuildDistricts():
 
                     results_block += '<p>Vote counts for individual write-in candidates are not published by the DC Board of Elections.</p>'
 
+                results_block += self.precinct_table(smd_id, election_year, display_names)
+
 
         return results_block
 
 
 
+    def precinct_table(self, smd_id, election_year, display_names):
+        """
+        Build table of the votes for each candidate in each precinct, for SMDs that span more than one precinct
+
+        display_names maps the candidate names used by DCBOE to the names shown in the results table
+        """
+
+        by_precinct = self.precinct_votes.smd_by_precinct(election_year, smd_id)
+
+        if len(by_precinct) < 2:
+            return ''
+
+        by_precinct = by_precinct.rename(columns=lambda c: display_names.get(c, c))
+        by_precinct.loc['Total Votes'] = by_precinct.sum()
+        by_precinct['Total'] = by_precinct.sum(axis=1)
+
+        display_df = by_precinct.reset_index(drop=True)
+        display_df.insert(0, 'Precinct', [f'Precinct {p}' for p in by_precinct.index[:-1]] + ['Total Votes'])
+
+        return (
+            '<h3>Votes by Precinct</h3>'
+            + html_table(
+                display_df
+                , align={c: 'left' if c == 'Precinct' else 'right' for c in display_df.columns}
+                , formats={c: '{:,.0f}'.format for c in display_df.columns if c != 'Precinct'}
+                , bold_last_row=True
+                )
+            )
+
+
+
     def candidate_status_block(self, smd_candidates, status, fields_to_try):
         """Return string containing a long table of the attributes of all candidates in a particular status"""
 
@@ -296,7 +341,7 @@ class BuildDistricts():
         if '_2022_' not in smd_id:
             return ''
 
-        smd_candidates = self.people_candidate_statuses[self.people_candidate_statuses['smd_id'] == smd_id].reset_index()
+        smd_candidates = self.people_candidate_statuses_by_smd.get(smd_id, self.people_candidate_statuses.iloc[0:0]).reset_index()
         num_candidates = len(smd_candidates)
 
         active_candidate_fields = [
@@ -356,7 +401,7 @@ class BuildDistricts():
         Create table for district landmarks
         """
         
-        district_row = self.districts[self.districts['smd_id'] == smd_id].squeeze().dropna()
+        district_row = self.districts_by_smd[smd_id].squeeze().dropna()
 
         fields_to_try = ['landmarks', 'notes']
 
@@ -400,25 +445,22 @@ class BuildDistricts():
         If show_redistricting_cycle is True, then the year of the cycle will be displayed.
         """
 
-        dc = pd.merge(self.districts, self.commissioners_current, how='left', on='smd_id')
-        dcp = pd.merge(dc, self.people, how='left', on='person_id')
-
-        dcp['full_name'] = dcp['full_name'].fillna('(vacant)')
+        smd_row = self.districts_by_smd[smd_id].squeeze()
 
         try:
-            overlap_smd_id_list = self.districts[self.districts.smd_id == smd_id].squeeze().overlap_smds.split(', ')
+            overlap_smd_id_list = smd_row.overlap_smds.split(', ')
         except:
             print('bad: ' + smd_id)
-            print(self.districts[self.districts.smd_id == smd_id].squeeze().overlap_smds)
+            print(smd_row.overlap_smds)
 
-        overlap_percentage_list = self.districts[self.districts.smd_id == smd_id].squeeze().overlap_percentage.split(', ')
-        smd_name = dcp[dcp.smd_id == smd_id].smd_name.iloc[0]
+        overlap_percentage_list = smd_row.overlap_percentage.split(', ')
+        smd_name = self.districts_commissioners_by_smd[smd_id].smd_name.iloc[0]
 
         district_list = '<ul>'
 
         for i, overlap_smd_id in enumerate(overlap_smd_id_list):
 
-            district_row = dcp[dcp.smd_id == overlap_smd_id].squeeze()
+            district_row = self.districts_commissioners_by_smd.get(overlap_smd_id, self.districts_commissioners.iloc[0:0]).squeeze()
 
             if district_row['full_name'] == '(vacant)':
                 if district_row['redistricting_year'] == 2022:
@@ -447,74 +489,92 @@ class BuildDistricts():
 
 
 
-    def run(self):
-        """
-        Build pages for each SMD
-        """
-
-        district_ancs = pd.merge(self.districts, self.ancs[['anc_id', 'anc_name']], how='inner', on='anc_id')
-        district_wards = pd.merge(district_ancs, self.wards[['ward_id', 'ward_name']], how='inner', on='ward_id')
-
-        # Calculate the updated_at for each SMD. Where the SMD has no more active candidates, use the max updated_at across all candidates
-        district_candidates = pd.merge(self.districts, self.candidates_this_year, how='left', on='smd_id')
-        max_updated_at = district_candidates['updated_at'].dropna().max()
-        smd_updated_at = district_candidates[['smd_id', 'updated_at']].fillna(value={'updated_at': max_updated_at})
+    def page_path(self, row):
+        """Path of the page for the SMD in row"""
 
-        # Process SMDs in order by smd_id
-        district_wards = district_wards.sort_values(by=['redistricting_year', 'smd_id'])
+        return 'docs/' + generate_url(row.smd_id, link_source='root')
 
-        for idx, row in tqdm(district_wards.iterrows(), total=len(district_wards), desc='SMDs   '):
-        # for idx, row in district_wards.iterrows():
 
-            smd_id = row['smd_id']
 
-            # debug
-            # if smd_id not in ('smd_2022_8F05'):
-            #     continue
+    def page_inputs(self, row):
+        """
+        List everything the page for the SMD in row is built from, for incremental builds
+        """
 
-            with open('templates/district.html', 'r') as f:
-                output = f.read()
-                
-            output = output.replace('REPLACE_WITH_MAPBOX_GL_JS_VERSION', config.mapbox_gl_js_version)
-            output = output.replace('REPLACE_WITH_SMD_NAME', f'{row.smd_name} [{row.redistricting_cycle} Cycle]')
+        smd_id = row.smd_id
+        linked_smd_ids = [smd_id] + row.neighbor_smds.split(', ') + str(row.overlap_smds).split(', ')
+
+        return [
+            row
+            , self.people_commissioners_by_smd.get(smd_id)
+            , self.rcp_by_smd.get(smd_id)
+            , self.precinct_votes.smd_rows_all_years(smd_id)
+            , self.write_in_winners_people_by_smd.get(smd_id)
+            , self.people_candidate_statuses_by_smd.get(smd_id)
+            , len(self.candidates_this_year) > 0
+            , self.districts_commissioners[self.districts_commissioners.smd_id.isin(linked_smd_ids)]
+            ]
 
-            if row['redistricting_year'] == 2012:
-                mapbox_slug_id = 'smd'
-            else:
-                mapbox_slug_id = 'smd-2022'
 
-            output = output.replace('REPLACE_WITH_MAPBOX_SLUG', self.mapbox_style_slugs[mapbox_slug_id])
-            
-            output = add_google_analytics(output)
-            output = add_geojson(self.smd_shape, 'smd_id', smd_id, output)
 
-            output = output.replace('<!-- replace with commissioner table -->', self.build_commissioner_table(smd_id))
+    def run(self, jobs=1, manifest=None):
+        """
+        Build pages for each SMD
+        """
 
-            if in_election_season():
-                output = output.replace('<!-- replace with candidate table -->', self.add_candidates(smd_id))
-    
-            output = output.replace('<!-- replace with results table -->', self.add_results(smd_id))
-            output = output.replace('<!-- replace with better know a district -->', self.build_better_know_a_district(smd_id))
+        district_ancs = pd.merge(self.districts, self.ancs[['anc_id', 'anc_name']], how='inner', on='anc_id')
+        district_wards = pd.merge(district_ancs, self.wards[['ward_id', 'ward_name']], how='inner', on='ward_id')
 
-            output = output.replace('<!-- replace with old/new heading -->', self.old_new_heading(smd_id))
-            output = output.replace('<!-- replace with overlap -->', self.overlap_list(smd_id))
+        # Process SMDs in order by smd_id
+        district_wards = district_wards.sort_values(by=['redistricting_year', 'smd_id'])
 
-            neighbor_smd_ids = row['neighbor_smds'].split(', ')
-            output = output.replace('<!-- replace with neighbors -->', build_district_list(neighbor_smd_ids, link_source='district', show_redistricting_cycle=True))
+        build_pages(self, 'build_district_page', district_wards, desc='SMDs   ', jobs=jobs, manifest=manifest)
 
-            output = output.replace('REPLACE_WITH_WARD_URL', generate_url(row.ward_id, link_source='district'))
-            output = output.replace('REPLACE_WITH_WARD_NAME', row.ward_name)
-            output = output.replace('REPLACE_WITH_ANC_URL', generate_url(row.anc_id, link_source='district'))
-            output = output.replace('REPLACE_WITH_ANC_NAME', row.anc_name)
 
-            output = output.replace('REPLACE_WITH_LONGITUDE', str(row['centroid_lon']))
-            output = output.replace('REPLACE_WITH_LATITUDE', str(row['centroid_lat']))
 
-            output = add_footer(output, link_source='district')
+    def build_district_page(self, row):
+        """
+        Build the page for one SMD
+        """
 
+        smd_id = row['smd_id']
 
-            with open('docs/' + generate_url(smd_id, link_source='root'), 'w') as f:
-                f.write(output)
+        if row['redistricting_year'] == 2012:
+            mapbox_slug_id = 'smd'
+        else:
+            mapbox_slug_id = 'smd-2022'
+
+        neighbor_smd_ids = row['neighbor_smds'].split(', ')
+
+        slots = {
+            'google_analytics': google_analytics_html
+            , 'mapbox_gl_js_version': config.mapbox_gl_js_version
+            , 'smd_name': f'{row.smd_name} [{row.redistricting_cycle} Cycle]'
+            , 'mapbox_slug': self.mapbox_style_slugs[mapbox_slug_id]
+            , 'xy': self.smd_bounds[smd_id]
+            , 'commissioner_table': self.build_commissioner_table(smd_id)
+            , 'results_table': self.add_results(smd_id)
+            , 'better_know_a_district': self.build_better_know_a_district(smd_id)
+            , 'old_new_heading': self.old_new_heading(smd_id)
+            , 'overlap': self.overlap_list(smd_id)
+            , 'neighbors': build_district_list(
+                neighbor_smd_ids
+                , link_source='district'
+                , show_redistricting_cycle=True
+                , district_commissioners=self.districts_commissioners
+                )
+            , 'ward_url': generate_url(row.ward_id, link_source='district')
+            , 'ward_name': row.ward_name
+            , 'anc_url': generate_url(row.anc_id, link_source='district')
+            , 'anc_name': row.anc_name
+            , 'longitude': str(row['centroid_lon'])
+            , 'latitude': str(row['centroid_lat'])
+            , 'footer': footer_html(link_source='district')
+            }
 
+        if in_election_season():
+            slots['candidate_table'] = self.add_candidates(smd_id)
 
+        output = load_template('district.html').render(slots)
 
+        write_html(self.page_path(row), output)
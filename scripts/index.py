@@ -7,6 +7,8 @@ import markdown
 
 import config
 
+from scripts.data_store import load_csv
+
 from scripts.common import (
     add_footer
     , candidate_form_link
@@ -14,6 +16,7 @@ from scripts.common import (
     , build_smd_html_table
     , mapbox_slugs
     , in_election_season
+    , write_html
 )
 
 from scripts.urls import (
@@ -35,7 +38,7 @@ from scripts.counts import Counts
 class BuildIndex():
 
     def __init__(self):
-        self.candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+        self.candidate_statuses = load_csv('data/candidate_statuses.csv')
         self.in_election_season = in_election_season()
 
 
@@ -45,8 +48,8 @@ class BuildIndex():
         Build HTML containing each ANC and its child SMDs with commissioners and candidates
         """
 
-        ancs = pd.read_csv('data/ancs.csv')
-        districts = pd.read_csv('data/districts.csv')
+        ancs = load_csv('data/ancs.csv')
+        districts = load_csv('data/districts.csv')
         district_comm_commelect = districts_candidates_commissioners(link_source='root')
 
         html = ''
@@ -121,8 +124,7 @@ class BuildIndex():
 
         output = add_footer(output, link_source='root')
 
-        with open('docs/list.html', 'w') as f:
-            f.write(output)
+        write_html('docs/list.html', output)
 
         print('built: list.html')
 
@@ -145,8 +147,7 @@ class BuildIndex():
 
         output = add_footer(output, link_source='root')
 
-        with open('docs/incumbents.html', 'w') as f:
-            f.write(output)
+        write_html('docs/incumbents.html', output)
 
         print('built: incumbents.html')
 
@@ -176,10 +177,10 @@ class BuildIndex():
             with open('templates/counts_non_election_season.html', 'r') as f:
                 output = f.read()
 
-            # # todo 2025: These counts need to be fixed
-            # output = output.replace('REPLACE_WITH_DC_COUNT', c.smd_vote_counts('dc', '#fdbf6f')) # light orange
-            # output = output.replace('REPLACE_WITH_WARD_COUNT', c.smd_vote_counts('ward_id', '#b2df8a')) # light green
-            # output = output.replace('REPLACE_WITH_ANC_COUNT', c.smd_vote_counts('anc_id', '#a6cee3')) # light blue
+            output = output.replace('REPLACE_WITH_RESULTS_YEAR', str(c.results_year()))
+            output = output.replace('REPLACE_WITH_DC_COUNT', c.smd_vote_counts('dc', '#fdbf6f')) # light orange
+            output = output.replace('REPLACE_WITH_WARD_COUNT', c.smd_vote_counts('ward_id', '#b2df8a')) # light green
+            output = output.replace('REPLACE_WITH_ANC_COUNT', c.smd_vote_counts('anc_id', '#a6cee3')) # light blue
 
 
         output = output.replace('REPLACE_WITH_COMMISSIONER_COUNT', c.commissioner_count())
@@ -187,8 +188,7 @@ class BuildIndex():
         output = add_google_analytics(output)
         output = add_footer(output, link_source='root')
 
-        with open('docs/counts.html', 'w') as f:
-            f.write(output)
+        write_html('docs/counts.html', output)
 
         print('built: counts.html')
 
@@ -206,8 +206,7 @@ class BuildIndex():
         output = add_google_analytics(output)
         output = add_footer(output, link_source='root')
 
-        with open('docs/about.html', 'w') as f:
-            f.write(output)
+        write_html('docs/about.html', output)
 
         print('built: about.html')
 
@@ -228,8 +227,7 @@ class BuildIndex():
         output = output.replace('<!-- replace with updates -->', updates_html)
         output = add_footer(output, link_source='root')
 
-        with open('docs/updates.html', 'w') as f:
-            f.write(output)
+        write_html('docs/updates.html', output)
 
         print(f'built: updates.html')
 
@@ -252,8 +250,7 @@ class BuildIndex():
         output = output.replace('REPLACE_WITH_SMD_2022_SLUG', mb_style_slugs['smd-2022'])
         # output = output.replace('REPLACE_WITH_SMD_2022_NO_CANDIDATES_SLUG', mb_style_slugs['smd-2022-no-candidates'])
 
-        with open(f'docs/{html_name}.html', 'w') as f:
-            f.write(output)
+        write_html(f'docs/{html_name}.html', output)
 
         print(f'built: {html_name}.html')
 
@@ -294,8 +291,7 @@ class BuildIndex():
         #     , str(election_status_count.loc['Contested (2 or more candidates)', 'Count of Districts'])
         #     )
 
-        with open(f'docs/{html_name}.html', 'w') as f:
-            f.write(output)
+        write_html(f'docs/{html_name}.html', output)
 
         print(f'built: {html_name}.html')
 
@@ -312,8 +308,7 @@ class BuildIndex():
         output = add_google_analytics(output)
         output = add_footer(output, link_source=link_source)
 
-        with open(f'docs/{html_name}.html', 'w') as f:
-            f.write(output)
+        write_html(f'docs/{html_name}.html', output)
 
         print(f'built: {html_name}.html')
 
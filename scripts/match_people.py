@@ -11,15 +11,21 @@ Sources of new people:
 Theoretically, every winning ballot candidate should have been in OpenANC before Election Day.
 """
 
+import re
+import hashlib
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from pathlib import Path
 
-from fuzzywuzzy import (
-    fuzz
-    , process
-)
+from fuzzywuzzy import fuzz
+
+try:
+    from rapidfuzz import (
+        fuzz as rapidfuzz_fuzz
+        , process as rapidfuzz_process
+        )
+except ImportError:
+    rapidfuzz_process = None
 
 from scripts.data_transformations import (
     confirm_key_uniqueness
@@ -31,6 +37,23 @@ from scripts.common import (
 )
 
 from scripts.refresh_data import RefreshData
+from scripts.reconcile import reconcile
+
+
+
+non_alphanumeric = re.compile(r'(?ui)\W')
+
+match_cache_path = Path('data/matching/match_cache.csv')
+
+# Words at the end of a name that are not part of the last name
+name_suffixes = {'jr', 'sr', 'ii', 'iii', 'iv', 'phd', 'esq'}
+
+soundex_digits = {
+    c: digit
+    for letters, digit in [('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')]
+    for c in letters
+    }
+
 
 
 class MatchPeople():
@@ -178,14 +201,18 @@ class MatchPeople():
 
         print('Creating match evaluation file.')
 
-        for idx, row in tqdm(match_df.iterrows(), total=len(match_df), desc='Matching input to OpenANC people'):
-                    
-            best_id, best_score = self.match_names(row[self.name_column], self.people['full_name'], self.people['person_id'])
+        match_cache = MatchCache(self.people)
+
+        matches = match_cache.best_matches(
+            match_df[self.name_column]
+            , smd_ids=match_df['smd_id'] if 'smd_id' in match_df.columns else None
+            , blocks=PeopleBlocks(self.people)
+            )
+
+        match_cache.save()
 
-            match_df.loc[idx, 'match_score'] = best_score
-            match_df.loc[idx, 'match_person_id'] = best_id
-            match_df.loc[idx, 'match_full_name'] = self.people[self.people.person_id == best_id].full_name.iloc[0]
-            match_df.loc[idx, 'match_smd_id'] = self.people[self.people.person_id == best_id].most_recent_smd_id.iloc[0]
+        for column in ['match_score', 'match_person_id', 'match_full_name', 'match_smd_id']:
+            match_df[column] = matches[column].to_numpy()
 
         match_df['good_match'] = '?'
 
@@ -204,12 +231,10 @@ class MatchPeople():
         Take one name, compare to list of names, return the best match and the match score
         """ 
 
-        matches = process.extract(search_string, list_to_search, scorer=fuzz.ratio, limit=1)
+        scores = name_similarity_matrix([search_string], list_to_search)[0]
+        best_position = scores.argmax()
 
-        best_id = list_of_ids[matches[0][2]]
-        best_score = matches[0][1]
-
-        return best_id, best_score
+        return list(list_of_ids)[best_position], scores[best_position]
 
 
 
@@ -224,10 +249,12 @@ class MatchPeople():
 
         print(f'\nLength of input dataframe: {len(input_df)}')
 
-        input_in_openanc = [h for h in input_df.external_id.tolist() if h in reference_df.external_id.tolist()]
+        external_ids = reconcile(input_df.external_id, reference_df.external_id)
+
+        input_in_openanc = external_ids.in_both
         print(f'Input external_ids in OpenANC reference list: {len(input_in_openanc)}')
 
-        input_not_in_openanc = [h for h in input_df.external_id.tolist() if h not in reference_df.external_id.tolist()]
+        input_not_in_openanc = external_ids.only_left
         print(f'Input external_ids *not* in OpenANC reference list: {len(input_not_in_openanc)}')
 
         reference_not_in_input_file = ~( reference_df['external_id'].isin(input_df['external_id']) )
@@ -237,4 +264,287 @@ class MatchPeople():
 
 
 
+def normalize_name(name):
+    """
+    Return name in the form that is compared when matching: lower case, with everything but letters and numbers
+    turned into spaces, and no spaces at either end. This is the same processing fuzzywuzzy applies.
+    """
+
+    return non_alphanumeric.sub(' ', str(name)).lower().strip()
+
+
+
+def name_similarity_matrix(search_names, names):
+    """
+    Return array with one row for each name in search_names and one column for each name in names,
+    holding the fuzz.ratio match score (0 to 100) of the two names
+
+    Every name is normalized once. With rapidfuzz installed, the whole matrix is computed in C.
+    Otherwise every pair is scored with fuzzywuzzy.
+    """
+
+    return normalized_similarity_matrix(
+        [normalize_name(n) for n in search_names]
+        , [normalize_name(n) for n in names]
+        )
+
+
+
+def normalized_similarity_matrix(search_names, names):
+    """Same as name_similarity_matrix, for names that have already gone through normalize_name()"""
+
+    if rapidfuzz_process:
+        scores = rapidfuzz_process.cdist(search_names, names, scorer=rapidfuzz_fuzz.ratio, dtype=np.float64)
+        return np.rint(scores).astype('int64')
+
+    return np.array([[fuzz.ratio(s, n) for n in names] for s in search_names], dtype='int64').reshape(len(search_names), len(names))
+
+
+
+def last_name_tokens(normalized_name):
+    """
+    Return list of the words in a normalized name that could be part of the last name:
+    every word after the first, leaving out suffixes and initials
+    """
+
+    return [t for t in normalized_name.split()[1:] if len(t) > 1 and t not in name_suffixes]
+
+
+
+def soundex(word):
+    """Return the four-character American Soundex code of a word, such as 'R163' for 'robert'"""
+
+    word = ''.join(c for c in word.lower() if 'a' <= c <= 'z')
+
+    if not word:
+        return ''
+
+    code = word[0].upper()
+    previous = soundex_digits.get(word[0], '')
+
+    for c in word[1:]:
+        digit = soundex_digits.get(c, '')
+
+        if digit and digit != previous:
+            code += digit
+
+        # h and w don't separate two letters with the same digit, vowels do
+        if c not in 'hw':
+            previous = digit
+
+    return (code + '000')[:4]
+
+
+
+class PeopleBlocks():
+    """
+    Blocking index over people, so that a name is only scored against the people who could plausibly match it
+
+    Each person is filed under a few blocking keys: each of their last-name tokens, the Soundex code
+    of their last name, and their most recent SMD. The people to score a name against are everyone
+    who shares at least one key with it. When no one does, the name is scored against all people.
+    """
+
+    def __init__(self, people):
+
+        self.normalized_names = [normalize_name(n) for n in people['full_name']]
+        self.all_positions = np.arange(len(people))
+
+        blocks = {}
+
+        for position, (name, smd_id) in enumerate(zip(self.normalized_names, people['most_recent_smd_id'])):
+            for key in blocking_keys(name, smd_id):
+                blocks.setdefault(key, []).append(position)
+
+        # Keyed by blocking key. Value is a sorted array of positions in people
+        self.blocks = {key: np.array(positions) for key, positions in blocks.items()}
+
+
+
+    def candidate_positions(self, normalized_name, smd_id=None):
+        """Return sorted array of the positions in people of everyone who shares a blocking key with the name"""
+
+        positions = [self.blocks[key] for key in blocking_keys(normalized_name, smd_id) if key in self.blocks]
+
+        if not positions:
+            return self.all_positions
+
+        return np.unique(np.concatenate(positions))
+
+
+
+def blocking_keys(normalized_name, smd_id=None):
+    """Return set of the blocking keys of a normalized name and the SMD connected to it"""
+
+    tokens = last_name_tokens(normalized_name)
+
+    keys = {('last_name', t) for t in tokens}
+
+    if tokens:
+        keys.add(('soundex', soundex(tokens[-1])))
+
+    if isinstance(smd_id, str):
+        keys.add(('smd_id', smd_id))
+
+    return keys
+
+
+
+def best_matches(search_names, people, k=1, smd_ids=None, blocks=None):
+    """
+    Return DataFrame with the k people whose full_name best matches each of search_names
+
+    people must have the columns person_id, full_name and most_recent_smd_id. There are up to k rows for each name
+    in search_names, in the same order, with the best match first (match_rank 1). Ties go to the person
+    who comes first in people.
+
+    With a PeopleBlocks index of people in blocks, each name is only scored against the people in its blocks,
+    which include the people whose most recent SMD is the matching entry of smd_ids. Without it, every name
+    is scored against every person.
+    """
+
+    search_names = [normalize_name(n) for n in search_names]
+
+    if smd_ids is None:
+        smd_ids = [None] * len(search_names)
+
+    if blocks is None:
+        scores = normalized_similarity_matrix(search_names, [normalize_name(n) for n in people['full_name']])
+        candidates = [(np.arange(len(people)), row) for row in scores]
+    else:
+        candidates = []
+        for name, smd_id in zip(search_names, smd_ids):
+            positions = blocks.candidate_positions(name, smd_id)
+            row = normalized_similarity_matrix([name], [blocks.normalized_names[p] for p in positions])[0]
+            candidates += [(positions, row)]
+
+    search_position = []
+    match_rank = []
+    match_score = []
+    best_positions = []
+
+    for i, (positions, row) in enumerate(candidates):
+
+        # The k best scores in the row, best first
+        best = np.argsort(-row, kind='stable')[:k]
+
+        search_position += [i] * len(best)
+        match_rank += list(range(1, len(best) + 1))
+        match_score += row[best].tolist()
+        best_positions += positions[best].tolist()
+
+    matches = pd.DataFrame({
+        'search_position': search_position
+        , 'match_rank': match_rank
+        , 'match_score': match_score
+        })
+
+    matches['match_person_id'] = people['person_id'].to_numpy()[best_positions]
+    matches['match_full_name'] = people['full_name'].to_numpy()[best_positions]
+    matches['match_smd_id'] = people['most_recent_smd_id'].to_numpy()[best_positions]
+
+    return matches
+
+
+
+class MatchCache():
+    """
+    Best matches computed on previous runs, saved to data/matching/match_cache.csv
+
+    Matches are keyed by the normalized name, the SMD it was matched with, k, and whether blocking was used.
+    They are only reused while the people table is exactly the same: the cache holds a digest of the people
+    it was computed against, and matches against any other version of the table are thrown away.
+    """
+
+    def __init__(self, people, path=match_cache_path):
+
+        self.path = Path(path)
+        self.people = people
+        self.people_digest = people_digest(people)
+
+        # Keyed by (normalized name, smd_id, k, blocked). Value is a list of (person_id, match_score), best first
+        self.matches = {}
+
+        if self.path.exists():
+
+            cache = pd.read_csv(self.path, dtype={'normalized_name': str, 'smd_id': str}, keep_default_na=False)
+            cache = cache[cache.people_digest == self.people_digest].sort_values(by='match_rank', kind='stable')
+
+            for row in cache.itertuples():
+                key = (row.normalized_name, row.smd_id, row.k, row.blocked)
+                self.matches.setdefault(key, []).append((row.match_person_id, row.match_score))
+
+
+
+    def best_matches(self, search_names, k=1, smd_ids=None, blocks=None):
+        """
+        Return the same DataFrame as best_matches(search_names, people, ...), only scoring the names not already in the cache
+        """
+
+        search_names = list(search_names)
+
+        if smd_ids is None:
+            smd_ids = [None] * len(search_names)
+
+        keys = [
+            (normalize_name(name), smd_id if isinstance(smd_id, str) else '', k, blocks is not None)
+            for name, smd_id in zip(search_names, smd_ids)
+            ]
+
+        new_keys = list(dict.fromkeys(key for key in keys if key not in self.matches))
+
+        if new_keys:
+
+            new_matches = best_matches(
+                [key[0] for key in new_keys]
+                , self.people
+                , k=k
+                , smd_ids=[key[1] or None for key in new_keys]
+                , blocks=blocks
+                )
+
+            for key in new_keys:
+                self.matches[key] = []
+
+            for row in new_matches.itertuples():
+                self.matches[new_keys[row.search_position]].append((row.match_person_id, row.match_score))
+
+        print(f'Names matched: {len(set(keys))}. Found in match cache: {len(set(keys)) - len(new_keys)}')
+
+        matches = pd.DataFrame(
+            [
+                (search_position, match_rank, match_score, person_id)
+                for search_position, key in enumerate(keys)
+                for match_rank, (person_id, match_score) in enumerate(self.matches[key], start=1)
+                ]
+            , columns=['search_position', 'match_rank', 'match_score', 'match_person_id']
+            )
+
+        people = self.people.set_index('person_id')
+        matches['match_full_name'] = people.loc[matches.match_person_id, 'full_name'].to_numpy()
+        matches['match_smd_id'] = people.loc[matches.match_person_id, 'most_recent_smd_id'].to_numpy()
+
+        return matches
+
+
+
+    def save(self):
+        """Write the matches against the current people table to disk"""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        pd.DataFrame(
+            [
+                (self.people_digest, *key, match_rank, person_id, match_score)
+                for key, matches in self.matches.items()
+                for match_rank, (person_id, match_score) in enumerate(matches, start=1)
+                ]
+            , columns=['people_digest', 'normalized_name', 'smd_id', 'k', 'blocked', 'match_rank', 'match_person_id', 'match_score']
+            ).to_csv(self.path, index=False)
+
+
+
+def people_digest(people):
+    """Return the SHA-224 hash of the people columns that matching depends on"""
 
+    return hashlib.sha224(people[['person_id', 'full_name', 'most_recent_smd_id']].to_csv(index=False).encode()).hexdigest()
@@ -3,7 +3,6 @@ Build People list and individual person pages
 """
 
 import pandas as pd
-from tqdm import tqdm
 from nameparser import HumanName
 from unidecode import unidecode
 from string import ascii_uppercase
@@ -11,11 +10,19 @@ from string import ascii_uppercase
 
 import config
 
+from scripts.data_store import load_csv
+from scripts.template import load_template
+
 from scripts.common import (
     add_footer
+    , footer_html
     , add_google_analytics
+    , google_analytics_html
     , build_data_table
     , make_ordinal
+    , build_pages
+    , group_rows
+    , write_html
 )
 
 from scripts.data_transformations import (
@@ -29,6 +36,7 @@ from scripts.data_transformations import (
 from scripts.urls import (
     generate_url
     , generate_link
+    , generate_links
     )
 
 
@@ -40,22 +48,15 @@ class BuildPeople():
         self.commissioners = list_commissioners()
         self.people = people_dataframe()
         self.rcp = results_candidate_people()
-        self.candidates = pd.read_csv('data/candidates.csv')
+        self.candidates = load_csv('data/candidates.csv')
 
         # Only build person pages for people who have been candidates or commissioners
         all_person_ids = pd.concat([self.candidates.person_id, self.commissioners.person_id]).reset_index()
         valid_person_ids = sorted(all_person_ids.person_id.unique())
         self.people_valid = self.people[self.people.person_id.isin(valid_person_ids)].copy()
 
-        self.districts = pd.read_csv('data/districts.csv')
-        self.districts['smd_url'] = self.districts.apply(
-            lambda x: generate_link(
-                x.smd_id
-                , link_source='person'
-                , link_body=x.smd_name
-                )
-            , axis=1
-            )
+        self.districts = load_csv('data/districts.csv')
+        self.districts['smd_url'] = generate_links(self.districts.smd_id, self.districts.smd_name, link_source='person')
 
         self.comm_districts = pd.merge(self.commissioners, self.districts, how='inner', on='smd_id')
         self.people_comm = pd.merge(self.people, self.comm_districts, how='inner', on='person_id')
@@ -97,6 +98,9 @@ class BuildPeople():
 
         self.candidates_districts_results_incumbents = self.candidates_districts_results.copy()
 
+        self.people_comm_by_person = group_rows(self.people_comm, 'person_id')
+        self.candidacies_by_person = group_rows(self.candidates_districts_results_incumbents, 'person_id')
+
 
 
     def people_list_page(self):
@@ -113,8 +117,7 @@ class BuildPeople():
 
         output = add_footer(output, link_source='person')
 
-        with open('docs/people/index.html', 'w') as f:
-            f.write(output)
+        write_html('docs/people/index.html', output)
 
         print('built: people index.html')
 
@@ -167,18 +170,32 @@ class BuildPeople():
 
 
 
-    def build_all_person_pages(self):
+    def build_all_person_pages(self, jobs=1, manifest=None):
         """
         Loop through all people and build a page for each
         """
 
-        for _, person in tqdm(self.people_valid.iterrows(), total=len(self.people_valid), desc='People '):
+        build_pages(self, 'build_person_page', self.people_valid, desc='People ', jobs=jobs, manifest=manifest)
+
+
 
-            # debug
-            # if person.person_id != 10380:
-            #     continue
+    def page_path(self, person):
+        """Path of the page for one person"""
 
-            self.build_person_page(person)
+        return 'docs/' + generate_url(person.person_name_id, link_source='root')
+
+
+
+    def page_inputs(self, person):
+        """
+        List everything the page for one person is built from, for incremental builds
+        """
+
+        return [
+            person
+            , self.people_comm_by_person.get(person.person_id)
+            , self.candidacies_by_person.get(person.person_id)
+            ]
 
 
 
@@ -187,15 +204,14 @@ class BuildPeople():
         Build a page for one person
         """
 
-        with open('templates/person.html', 'r') as f:
-            output = f.read()
-
-        output = add_google_analytics(output)
-        output = output.replace('REPLACE_WITH_PERSON_FULL_NAME', person.full_name)
+        slots = {
+            'google_analytics': google_analytics_html
+            , 'person_full_name': person.full_name
+            }
 
         # Determine if this person has run for office or served as a commissioner
-        person_districts = self.people_comm.loc[self.people_comm.person_id == person.person_id].copy()
-        person_candidacies = self.candidates_districts_results_incumbents.loc[self.candidates_districts_results_incumbents.person_id == person.person_id].copy()
+        person_districts = self.people_comm_by_person.get(person.person_id, self.people_comm.iloc[0:0]).copy()
+        person_candidacies = self.candidacies_by_person.get(person.person_id, self.candidates_districts_results_incumbents.iloc[0:0]).copy()
         person_candidacies.sort_values(by='election_year', ascending=False, inplace=True)
 
         # Only add the link for people with active candidacy, currently serving as commissioner, or will serve as commissioner in the future
@@ -208,7 +224,7 @@ class BuildPeople():
             link_table = build_data_table(person, ['website_link', 'mastodon_link', 'twitter_link', 'facebook_link'])
             if link_table != '':
                 link_table = '<h2>Links</h2><ul>' + link_table + '</ul>'
-            output = output.replace('<!-- replace with person links -->', link_table)
+            slots['person_links'] = link_table
         
 
         if len(person_districts) > 0:
@@ -224,7 +240,7 @@ class BuildPeople():
 
             district_block += '</ul>'
 
-            output = output.replace('<!-- replace with districts represented -->', district_block)
+            slots['districts_represented'] = district_block
 
 
         if len(person_candidacies) > 0:
@@ -240,18 +256,19 @@ class BuildPeople():
 
             candidacies_block += '</ul>'
 
-            output = output.replace('<!-- replace with candidacies -->', candidacies_block)
-            
+            slots['candidacies'] = candidacies_block
 
-        output = add_footer(output, link_source='person')
 
-        with open('docs/' + generate_url(person.person_name_id, link_source='root'), 'w') as f:
-            f.write(output)
+        slots['footer'] = footer_html(link_source='person')
+
+        output = load_template('person.html').render(slots)
+
+        write_html(self.page_path(person), output)
 
 
 
-    def run(self):
+    def run(self, jobs=1, manifest=None):
 
         self.people_list_page()
-        self.build_all_person_pages()
+        self.build_all_person_pages(jobs, manifest)
 
@@ -0,0 +1,119 @@
+"""
+Votes for each ANC candidate in each precinct, kept in memory as a compact cube
+
+ProcessElectionResults writes data/dcboe/precinct_votes.csv in the same pass over the DCBOE results
+files that produces the candidate totals. PrecinctVotes loads that file once, with each column in the
+smallest dtype that fits it, sorted by election year, SMD and precinct. The rows of any one SMD in any
+one year are a contiguous slice of the cube, so the precinct breakdown of a district is a slice lookup,
+and rollups to wards or SMDs are a single groupby, without reading the results files again.
+"""
+
+from scripts.data_store import load_csv
+
+
+
+precinct_votes_path = 'data/dcboe/precinct_votes.csv'
+
+precinct_votes_dtypes = {
+    'election_year': 'int16'
+    , 'smd_id': 'category'
+    , 'precinct_number': 'int16'
+    , 'ward_number': 'int8'
+    , 'candidate_name': 'category'
+    , 'votes': 'int32'
+    }
+
+
+
+class PrecinctVotes():
+
+    def __init__(self, df):
+
+        self.cube = (
+            df[list(precinct_votes_dtypes)]
+            .astype(precinct_votes_dtypes)
+            .sort_values(by=['election_year', 'smd_id', 'precinct_number', 'candidate_name'])
+            .reset_index(drop=True)
+            )
+
+        # Keyed by (election_year, smd_id). Value is the (start, stop) of that SMD's rows in the cube
+        self.smd_slices = {
+            (int(election_year), smd_id): (positions[0], positions[-1] + 1)
+            for (election_year, smd_id), positions
+            in self.cube.groupby(['election_year', 'smd_id'], observed=True).indices.items()
+            }
+
+        # Keyed by smd_id. Value is the positions of that SMD's rows in the cube, across all election years
+        self.smd_positions = self.cube.groupby('smd_id', observed=True).indices
+
+
+
+    @classmethod
+    def from_csv(cls, csv_path=precinct_votes_path):
+        """Return the PrecinctVotes stored in csv_path"""
+
+        return cls(load_csv(csv_path))
+
+
+
+    def smd_rows(self, election_year, smd_id):
+        """Return the rows of the cube for one SMD in one election year"""
+
+        start, stop = self.smd_slices.get((election_year, smd_id), (0, 0))
+
+        return self.cube.iloc[start:stop]
+
+
+
+    def smd_rows_all_years(self, smd_id):
+        """Return the rows of the cube for one SMD in every election year"""
+
+        return self.cube.iloc[self.smd_positions.get(smd_id, [])]
+
+
+
+    def smd_by_precinct(self, election_year, smd_id):
+        """
+        Return DataFrame with a row for each precinct in the SMD and a column of votes for each candidate
+
+        Candidates are in order by their total votes in the SMD, the winner first.
+        Precincts where no votes were cast in the contest are left out.
+        """
+
+        rows = self.smd_rows(election_year, smd_id)
+
+        by_precinct = rows.pivot_table(
+            index='precinct_number'
+            , columns='candidate_name'
+            , values='votes'
+            , aggfunc='sum'
+            , fill_value=0
+            , observed=True
+            )
+
+        by_precinct = by_precinct[by_precinct.sum(axis=1) > 0]
+
+        candidate_order = by_precinct.sum().sort_values(ascending=False, kind='stable').index
+
+        return by_precinct[candidate_order]
+
+
+
+    def rollup(self, by, election_year=None):
+        """
+        Return Series with the votes summed by the columns of the cube in by, such as ['election_year', 'ward_number']
+        """
+
+        cube = self.cube
+
+        if election_year is not None:
+            cube = cube[cube.election_year == election_year]
+
+        return cube.groupby(by, observed=True).votes.sum()
+
+
+
+    def ward_totals(self, election_year):
+        """Return Series with the votes cast for ANC candidates in each ward"""
+
+        return self.rollup(['ward_number'], election_year=election_year)
@@ -31,7 +31,12 @@ from scripts.common import (
     , validate_smd_ids
     )
 
-from scripts.match_people import MatchPeople
+from scripts.reconcile import reconcile
+
+from scripts.match_people import (
+    MatchCache
+    , PeopleBlocks
+    )
 
 
 pd.set_option('display.max_colwidth', 180)
@@ -311,39 +316,28 @@ class ProcessCandidates():
         # Exclude the hash_ids that are currently in the OpenANC candidates table
         candidates_to_match = candidates_dcboe[ ~(candidates_dcboe['external_id'].isin(candidates['external_id'])) ].copy()
 
-        candidates_to_match['match_person_id'] = pd.NA
-        candidates_to_match['match_person_id'] = candidates_to_match['match_person_id'].astype('Int64')
-        candidates_to_match['match_score'] = pd.NA
-        candidates_to_match['match_person_id'] = pd.NA
-        candidates_to_match['match_person_full_name'] = pd.NA
-        candidates_to_match['match_person_smd_id'] = pd.NA
-
-
         # Look for the OpenANC person that has the highest match score against each new candidate
 
         # todo: remove this whole script in favor of MatchPeople?
-        mp = MatchPeople()
-
-        for idx, row in candidates_to_match.iterrows():
 
-            # In most years, we should match only to people with the same smd_id
-            # current_comm = people[people['most_recent_smd_id'] == row['smd_id']].copy()
-
-            # In the redistricting year, a lot of people are changing districts, so match to all people
-            current_comm = people.copy()
-
-            if len(current_comm) == 0:
-                continue
+        # Each candidate is scored against the people with the same last name, a similar-sounding last name,
+        # or the same most recent smd_id. Candidates with none of those are scored against all people,
+        # since in the redistricting year a lot of people are changing districts.
+        match_cache = MatchCache(people)
 
+        matches = match_cache.best_matches(
+            candidates_to_match['candidate_name']
+            , smd_ids=candidates_to_match['smd_id']
+            , blocks=PeopleBlocks(people)
+            )
 
-            best_id, best_score = mp.match_names(row['candidate_name'], current_comm['full_name'], current_comm['person_id'])
+        match_cache.save()
 
-            candidates_to_match.loc[idx, 'match_score'] = best_score
-            candidates_to_match.loc[idx, 'match_person_id'] = best_id
-            candidates_to_match.loc[idx, 'match_person_full_name'] = people[people.person_id == best_id].full_name.iloc[0]
-            candidates_to_match.loc[idx, 'match_person_smd_id'] = people[people.person_id == best_id].most_recent_smd_id.iloc[0]
+        candidates_to_match['match_score'] = matches['match_score'].to_numpy()
+        candidates_to_match['match_person_id'] = matches['match_person_id'].to_numpy()
+        candidates_to_match['match_person_full_name'] = matches['match_full_name'].to_numpy()
+        candidates_to_match['match_person_smd_id'] = matches['match_smd_id'].to_numpy()
 
-        
         candidates_to_match['good_match'] = '?'
         match_columns = [
             'external_id'
@@ -375,10 +369,12 @@ class ProcessCandidates():
 
         print(f'\nValid DCBOE candidates: {len(dcboe)}')
 
-        dcboe_in_openanc = [h for h in dcboe.external_id.tolist() if h in candidates.external_id.tolist()]
+        external_ids = reconcile(dcboe.external_id, candidates.external_id)
+
+        dcboe_in_openanc = external_ids.in_both
         print(f'DCBOE candidate IDs in OpenANC candidate list: {len(dcboe_in_openanc)}')
 
-        dcboe_not_in_openanc = [h for h in dcboe.external_id.tolist() if h not in candidates.external_id.tolist()]
+        dcboe_not_in_openanc = external_ids.only_left
         print(f'DCBOE candidate IDs *not* in OpenANC candidate list: {len(dcboe_not_in_openanc)}')
 
         openanc_candidates_not_in_dcboe_file = ~( candidates['external_id'].isin(dcboe['external_id']) )
@@ -463,7 +459,7 @@ class ProcessCandidates():
         
         people_create[people_create_columns].to_csv('data/dcboe/2c_people_create.csv', index=False)
 
-        openanc_not_in_dcboe = [h for h in candidates_this_year[candidates_this_year.external_id.notnull()].external_id.tolist() if h not in dcboe.external_id.tolist()]
+        openanc_not_in_dcboe = reconcile(candidates_this_year.external_id.dropna(), dcboe.external_id).only_left
         print(f'\nCandidates hash_ids in OpenANC that are no longer in the DCBOE list (should be zero): {len(openanc_not_in_dcboe)}')
         
         if openanc_not_in_dcboe:
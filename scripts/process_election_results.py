@@ -2,6 +2,8 @@
 Read in election results files from DCBOE, perform calculations, and match to database
 """
 
+import re
+import multiprocessing
 import pandas as pd
 from tqdm import tqdm
 
@@ -16,6 +18,57 @@ from scripts.common import (
 
 
 
+# Columns read from the DCBOE results files, which name them differently depending on the year.
+# Files from 2018 onward use CamelCase names, earlier files use upper case.
+results_columns = {
+    'ContestNumber': 'contest_number'
+    , 'ContestName': 'contest_name'
+    , 'PrecinctNumber': 'precinct_number'
+    , 'WardNumber': 'ward_number'
+    , 'Candidate': 'candidate_name'
+    , 'Votes': 'votes'
+    , 'CONTEST_ID': 'contest_number'
+    , 'CONTEST_NAME': 'contest_name'
+    , 'PRECINCT_NUMBER': 'precinct_number'
+    , 'WARD': 'ward_number'
+    , 'CANDIDATE': 'candidate_name'
+    , 'VOTES': 'votes'
+    }
+
+results_column_dtypes = {
+    'contest_number': 'int32'
+    , 'contest_name': 'str'
+    , 'precinct_number': 'int16'
+    , 'ward_number': 'int8'
+    , 'candidate_name': 'str'
+    , 'votes': 'int32'
+    }
+
+results_dtypes = {column: results_column_dtypes[new_column] for column, new_column in results_columns.items()}
+
+# Columns that identify one row of precinct_votes.csv, besides election_year
+precinct_votes_keys = ['smd_id', 'contest_number', 'precinct_number', 'ward_number', 'candidate_name']
+
+# Rows of the ANC contests that count ballots without a vote for a candidate. Results files before 2022 leave them out.
+over_under_votes = ['OVER VOTES', 'UNDER VOTES']
+
+# Contests that give totals for each precinct, rather than votes for a candidate
+precinct_total_contests = {
+    'REGISTERED VOTERS - TOTAL': 'registered_voters'
+    , 'BALLOTS CAST - TOTAL': 'ballots_cast'
+    }
+
+# Number of rows of a results file held in memory at a time
+results_chunk_size = 10_000
+
+# ANC contests are named like "ANC-6C02" from 2024 on, and like "ANC - 6C02 SINGLE MEMBER DISTRICT  02-ANC 6C" before
+anc_contest_2024 = re.compile(r'ANC-')
+anc_smd_2024 = r'(?<=ANC-)(\S*)'
+anc_contest = re.compile(r'SINGLE MEMBER DISTRICT')
+anc_smd = r'(?<=ANC - )(.*)(?=SINGLE MEMBER)'
+
+
+
 class ProcessElectionResults():
 
     def __init__(self):
@@ -36,44 +89,23 @@ class ProcessElectionResults():
 
     def read_election_results_csv(self, election_year):
         """
-        Read and preprocess data from DCBOE election CSV. Return a cleaned DataFrame
+        Read and preprocess data from DCBOE election CSV.
+
+        Return a tuple of three cleaned DataFrames: the results of each candidate, their votes in each precinct,
+        and the turnout in each SMD
         """
     
-        df = pd.read_csv(f'data/dcboe/election_results/{self.results_files[election_year]}')
-
-        df = df.rename(columns={
-            'Candidate': 'candidate_name'
-            , 'ContestName': 'contest_name'
-            , 'ContestNumber': 'contest_number'
-            , 'Votes': 'votes'
-        })
-
-        if election_year == 2024:
-            anc = df[df['contest_name'].str.contains('ANC-')].copy()
-        else:
-            anc = df[df['contest_name'].str.contains('SINGLE MEMBER DISTRICT')].copy()
-
-        smd_id_prefix = 'smd_'
-        if election_year >= 2022:
-            smd_id_prefix += '2022_'
-
-        if election_year == 2024:
-            # Stop extraction at space, for district entered as "ANC-6/8F01 6/8F01"
-            anc['smd_id'] = smd_id_prefix + anc['contest_name'].str.extract('(?<=ANC-)(\S*)')
-            anc['smd_id'] = anc['smd_id'].str.replace('6/8F', '8F')
-        else:
-            anc['smd_id'] = smd_id_prefix + anc['contest_name'].str.extract('(?<=ANC - )(.*)(?=SINGLE MEMBER)')
+        precinct_votes, precinct_totals = self.read_precinct_votes(election_year)
 
-        anc['smd_id'] = anc['smd_id'].str.strip()
-        validate_smd_ids(anc)
+        smd_turnout = self.smd_turnout(precinct_votes, precinct_totals)
+        precinct_votes = precinct_votes[~precinct_votes.candidate_name.isin(over_under_votes)].reset_index(drop=True)
 
         candidates_results = (
-            anc
-            [~anc.candidate_name.isin(['OVER VOTES', 'UNDER VOTES'])]
+            precinct_votes
             .groupby(['smd_id', 'contest_number', 'candidate_name'])
             .votes.sum()
             .reset_index()
-        )
+            )
 
         # external_id is a hash of the uppercase candidate name and the smd_id they were running in
         candidates_results['candidate_name_upper'] = candidates_results['candidate_name'].str.upper()
@@ -88,83 +120,179 @@ class ProcessElectionResults():
         )
 
         # Sort candidates by the number of votes they got within SMD, making the winner first
-        candidates_results = candidates_results.sort_values(by=['smd_id', 'votes'], ascending=[True, False])
-
+        candidates_results = (
+            candidates_results
+            .sort_values(by=['smd_id', 'votes'], ascending=[True, False])
+            .reset_index(drop=True)
+            )
 
+        smd_votes = candidates_results.groupby('smd_id').votes
 
         # Calculate the total votes cast in each SMD
-
-        total_votes = candidates_results.groupby('smd_id').votes.sum()
-        total_votes.name = 'total_votes'
-        candidates_results = pd.merge(candidates_results, total_votes, how='inner', on='smd_id')
+        candidates_results['total_votes'] = smd_votes.transform('sum')
         candidates_results['vote_share'] = candidates_results['votes'] / candidates_results['total_votes']
 
+        # Votes for the winner in each SMD, used to calculate the "margin of defeat" for all other candidates.
+        winning_votes = smd_votes.transform('max')
 
+        # Votes for the next candidate within the SMD. For the first place candidate,
+        # this is the votes of the second-place candidate, or NaN if they ran unopposed.
+        next_votes = smd_votes.shift(-1)
 
-        # Create columns showing the number of votes the winner in each SMD received.
-        # This will be used to calculate the "margin of defeat" for all other candidates.
+        # Calculate the margin of victory - positive for winners, negative for losers.
+        # For winners, the margin of victory is their votes minus the second-place votes.
+        # For losers, the margin of defeat is their votes minus the first-place votes.
+        contested_winners = candidates_results['winner'] & next_votes.notna()
+        compared_votes = winning_votes.where(~contested_winners, next_votes).astype('int64')
 
-        winning_votes = candidates_results.groupby('smd_id').agg(
-            winning_votes=('votes', max)
-            , winning_vote_percentage=('vote_share', max)
+        candidates_results['margin_of_victory'] = candidates_results['votes'] - compared_votes
+        candidates_results['margin_of_victory_percentage'] = (
+            candidates_results['vote_share'] - (compared_votes / candidates_results['total_votes'])
         )
 
-        candidates_results = pd.merge(candidates_results, winning_votes, how='inner', on='smd_id')
+        # Count the number of candidates who received votes. This lumps all write-ins as one candidate.
+        # num_candidates is not currently used by the frontend, just for humans checking the data.
+        candidates_results['num_candidates'] = candidates_results.groupby('smd_id').candidate_name.transform('count')
 
+        print(f'Election results processed for election year: {election_year}. Number of candidates: {candidates_results.external_id.nunique()}. Total votes: {candidates_results.votes.sum():,}')
 
+        return candidates_results, precinct_votes, smd_turnout
 
-        # Create columns showing the number of votes for the next candidate in the DataFrame.
-        # For the first place candidate in an SMD, these _shifted columns will have the votes
-        # of the second-place candidate.
 
-        shift_one = candidates_results[['smd_id', 'votes', 'vote_share']].shift(-1)
-        shift_one = shift_one.rename(columns={
-            'smd_id': 'smd_id_shifted'
-            , 'votes': 'votes_shifted'
-            , 'vote_share': 'vote_share_shifted'
-        })
 
-        candidates_results = pd.concat([candidates_results, shift_one], axis=1)
+    def smd_turnout(self, precinct_votes, precinct_totals):
+        """
+        Return DataFrame with the turnout, over votes and under votes in the ANC contest of each SMD
+
+        DCBOE only publishes registered voters and ballots cast for whole precincts, and precincts don't line up
+        with SMDs. Each precinct's totals are split between its SMDs in proportion to the ballots counted in each
+        SMD's ANC contest in that precinct, so registered_voters, ballots_cast and turnout are estimates.
+        """
 
+        smd_precincts = (
+            precinct_votes
+            .assign(
+                candidate_votes=precinct_votes.votes.where(~precinct_votes.candidate_name.isin(over_under_votes), 0)
+                , over_votes=precinct_votes.votes.where(precinct_votes.candidate_name == 'OVER VOTES', 0)
+                , under_votes=precinct_votes.votes.where(precinct_votes.candidate_name == 'UNDER VOTES', 0)
+                )
+            .groupby(['smd_id', 'precinct_number'])
+            .agg(
+                votes=('candidate_votes', 'sum')
+                , over_votes=('over_votes', 'sum')
+                , under_votes=('under_votes', 'sum')
+                , ballots=('votes', 'sum')
+                )
+            .reset_index()
+            )
 
+        precinct_share = (
+            smd_precincts['ballots'] / smd_precincts.groupby('precinct_number').ballots.transform('sum')
+            ).fillna(0)
 
-        # Calculate the margin of victory - positive for winners, negative for losers
-        candidates_results['margin_of_victory'] = None
-        candidates_results['margin_of_victory_percentage'] = None
+        for total in ['registered_voters', 'ballots_cast']:
+            smd_precincts[total] = smd_precincts['precinct_number'].map(precinct_totals[total]).fillna(0) * precinct_share
 
-        contested_winners = (
-            (candidates_results['smd_id'] == candidates_results['smd_id_shifted']) & (candidates_results['winner'])
-        )
+        turnout = smd_precincts.groupby('smd_id').agg(
+            registered_voters=('registered_voters', 'sum')
+            , ballots_cast=('ballots_cast', 'sum')
+            , ballots=('ballots', 'sum')
+            , votes=('votes', 'sum')
+            , over_votes=('over_votes', 'sum')
+            , under_votes=('under_votes', 'sum')
+            ).reset_index()
 
-        # For winners, the margin of victory is their votes minus the second-place votes
-        candidates_results.loc[contested_winners, 'margin_of_victory'] = (
-            candidates_results['votes'] - candidates_results['votes_shifted']
-        )
-        candidates_results.loc[contested_winners, 'margin_of_victory_percentage'] = (
-            candidates_results['vote_share'] - candidates_results['vote_share_shifted']
-        )
+        turnout[['registered_voters', 'ballots_cast']] = turnout[['registered_voters', 'ballots_cast']].round().astype('int64')
+        turnout['turnout'] = turnout['ballots_cast'] / turnout['registered_voters']
+        turnout['overvote_rate'] = turnout['over_votes'] / turnout['ballots']
+        turnout['undervote_rate'] = turnout['under_votes'] / turnout['ballots']
 
-        # For losers, the margin of defeat is the their votes minus the first-place votes
-        candidates_results.loc[~contested_winners, 'margin_of_victory'] = (
-            candidates_results['votes'] - candidates_results['winning_votes']
-        )
+        if not precinct_votes.candidate_name.isin(over_under_votes).any():
+            # Without over and under votes, ballots only counts the ANC ballots with a vote for a candidate
+            turnout[['over_votes', 'under_votes', 'overvote_rate', 'undervote_rate']] = pd.NA
 
-        candidates_results.loc[~contested_winners, 'margin_of_victory_percentage'] = (
-            candidates_results['vote_share'] - candidates_results['winning_vote_percentage']
-        )
+        return turnout
 
 
 
-        # Count the number of candidates who received votes. This lumps all write-ins as one candidate.
-        # num_candidates is not currently used by the frontend, just for humans checking the data.
+    def read_precinct_votes(self, election_year):
+        """
+        Return a tuple of two DataFrames: the votes of each candidate in each ANC contest in each precinct,
+        including over and under votes, and the registered voters and ballots cast in each precinct
 
-        num_candidates = candidates_results.groupby('smd_id').candidate_name.count()
-        num_candidates.name = 'num_candidates'
-        candidates_results = pd.merge(candidates_results, num_candidates, how='inner', on='smd_id')
+        The results file is read a chunk at a time. Only the ANC contests in each chunk are kept,
+        and their votes are summed right away, so memory use doesn't grow with the size of the file.
+        """
 
-        print(f'Election results processed for election year: {election_year}. Number of candidates: {candidates_results.external_id.nunique()}. Total votes: {candidates_results.votes.sum():,}')
+        if election_year == 2024:
+            contest_pattern = anc_contest_2024
+            smd_pattern = anc_smd_2024
+        else:
+            contest_pattern = anc_contest
+            smd_pattern = anc_smd
+
+        smd_id_prefix = 'smd_'
+        if election_year >= 2022:
+            smd_id_prefix += '2022_'
+
+        results_chunks = pd.read_csv(
+            f'data/dcboe/election_results/{self.results_files[election_year]}'
+            , usecols=lambda c: c in results_columns
+            , dtype=results_dtypes
+            , chunksize=results_chunk_size
+            )
+
+        smd_ids = set()
+        chunk_votes = []
+        chunk_totals = []
+
+        for chunk in results_chunks:
+
+            chunk = chunk.rename(columns=results_columns)
+
+            totals = chunk[chunk['contest_name'].isin(precinct_total_contests)]
+            chunk_totals += [totals.groupby(['precinct_number', 'contest_name']).votes.sum()]
+
+            anc = chunk[chunk['contest_name'].str.contains(contest_pattern, na=False)].copy()
+
+            if len(anc) == 0:
+                continue
+
+            # Stop extraction at space, for district entered as "ANC-6/8F01 6/8F01"
+            anc['smd_id'] = smd_id_prefix + anc['contest_name'].str.extract(smd_pattern, expand=False)
+
+            if election_year == 2024:
+                anc['smd_id'] = anc['smd_id'].str.replace('6/8F', '8F')
+
+            anc['smd_id'] = anc['smd_id'].str.strip()
+            smd_ids.update(anc['smd_id'])
+
+            # Results files before 2018 pad the names with spaces
+            anc['candidate_name'] = anc['candidate_name'].str.strip()
+
+            chunk_votes += [anc.groupby(precinct_votes_keys).votes.sum()]
+
+        validate_smd_ids(pd.DataFrame({'smd_id': sorted(smd_ids)}))
+
+        # A precinct can be split across two chunks, so sum the chunks again
+        precinct_votes = (
+            pd.concat(chunk_votes)
+            .groupby(level=precinct_votes_keys)
+            .sum()
+            .astype('int64')
+            .reset_index()
+            )
 
-        return candidates_results
+        precinct_totals = (
+            pd.concat(chunk_totals)
+            .groupby(level=['precinct_number', 'contest_name'])
+            .sum()
+            .unstack('contest_name')
+            .rename(columns=precinct_total_contests)
+            .reindex(columns=list(precinct_total_contests.values()))
+            )
+
+        return precinct_votes, precinct_totals
 
 
 
@@ -198,12 +326,66 @@ class ProcessElectionResults():
 
 
 
-    def run(self):
+    def process_years(self, method_name, election_years, jobs=1):
+        """
+        Call a method of this class once for each election year, returning a dict of the results keyed by year
+
+        Each year is independent of the others, so with jobs greater than 1 the years are spread across
+        that many worker processes. The dict is always in the order of election_years, so the files written
+        from it are the same no matter how many jobs are used.
+        """
+
+        election_years = list(election_years)
+        method = getattr(self, method_name)
+
+        if jobs <= 1 or len(election_years) <= 1:
+            results = [method(election_year) for election_year in election_years]
+        else:
+            with multiprocessing.Pool(min(jobs, len(election_years))) as pool:
+                results = pool.map(method, election_years)
+
+        return dict(zip(election_years, results))
+
+
+
+    def run(self, jobs=1):
 
-        results_dict = {}
+        results_dict = self.process_years('read_election_results_csv', self.results_files, jobs=jobs)
+
+        precinct_votes_all_years = pd.concat(
+            {election_year: precinct_votes for election_year, (_, precinct_votes, _) in results_dict.items()}
+            , names=['election_year']
+            ).reset_index()
+
+        precinct_votes_all_years[[
+            'election_year'
+            , 'smd_id'
+            , 'precinct_number'
+            , 'ward_number'
+            , 'candidate_name'
+            , 'votes'
+        ]].to_csv('data/dcboe/precinct_votes.csv', index=False)
+
+        smd_turnout_all_years = pd.concat(
+            {election_year: smd_turnout for election_year, (_, _, smd_turnout) in results_dict.items()}
+            , names=['election_year']
+            ).reset_index()
+
+        smd_turnout_all_years[[
+            'election_year'
+            , 'smd_id'
+            , 'registered_voters'
+            , 'ballots_cast'
+            , 'ballots'
+            , 'votes'
+            , 'over_votes'
+            , 'under_votes'
+            , 'turnout'
+            , 'overvote_rate'
+            , 'undervote_rate'
+        ]].to_csv('data/dcboe/smd_turnout.csv', index=False)
 
-        for election_year in self.results_files:
-            results_dict[election_year] = self.read_election_results_csv(election_year)
+        results_dict = {election_year: candidates_results for election_year, (candidates_results, _, _) in results_dict.items()}
 
         results_all_years = pd.concat(results_dict, names=['election_year']).reset_index()
 
@@ -224,9 +406,7 @@ class ProcessElectionResults():
         ]].to_csv('data/dcboe/candidate_votes.csv', index=False)
 
 
-        write_in_dict = {}
-        for election_year in self.write_in_files:
-            write_in_dict[election_year] = self.read_write_in_winners(election_year)
+        write_in_dict = self.process_years('read_write_in_winners', self.write_in_files, jobs=jobs)
 
         write_in_all_years = pd.concat(write_in_dict, names=['election_year']).reset_index()
 
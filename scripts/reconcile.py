@@ -0,0 +1,32 @@
+"""
+Reconcile two lists of keys, such as the external_ids in a DCBOE file and the ones already in OpenANC
+"""
+
+from collections import namedtuple
+
+
+
+# Each part is a list of keys, in the order and with the repeats of the list it comes from:
+# in_both and only_left from the left list, only_right from the right list
+Reconciliation = namedtuple('Reconciliation', ['in_both', 'only_left', 'only_right'])
+
+
+
+def reconcile(left, right):
+    """
+    Return Reconciliation splitting the keys of left and right into the ones in both lists and the ones in only one
+
+    Each list is turned into a set once, so every lookup is a hash lookup instead of a scan of the other list.
+    """
+
+    left = list(left)
+    right = list(right)
+
+    left_keys = set(left)
+    right_keys = set(right)
+
+    return Reconciliation(
+        in_both=[k for k in left if k in right_keys]
+        , only_left=[k for k in left if k not in right_keys]
+        , only_right=[k for k in right if k not in left_keys]
+        )
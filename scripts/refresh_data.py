@@ -8,20 +8,19 @@ import string
 import os.path
 import numpy as np
 import pandas as pd
-import geopandas as gpd
 from pathlib import Path
 from datetime import datetime
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
 
 
 import config
 
+from scripts.data_store import load_csv, write_csv_cache
+
 from scripts.common import assemble_divo, in_election_season
 
 from scripts.urls import (
     generate_url
+    , generate_urls
     , format_name_for_url
     )
 
@@ -61,6 +60,11 @@ class RefreshData():
         Source: https://developers.google.com/sheets/api/quickstart/python
         """
 
+        # Imported here so that importing this module doesn't load the Google API clients
+        from googleapiclient.discovery import build
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
         creds = None
         # The file token.pickle stores the user's access and refresh tokens, and is
         # created automatically when the authorization flow completes for the first
@@ -172,6 +176,8 @@ class RefreshData():
         # todo: push these tilesets to Mapbox via API
         """
 
+        import geopandas as gpd
+
         smd = gpd.read_file(source_geojson)
         smd = smd[['smd_id', 'geometry']].copy()
 
@@ -186,6 +192,8 @@ class RefreshData():
     def add_data_to_label_points(self, source_csv, destination_filename):
         """Add data to CSV with lat/long of SMD label points"""
 
+        import geopandas as gpd
+
         lp = pd.read_csv(source_csv)
 
         lp_df = pd.merge(lp, self.map_display_df, how='inner', on='smd_id')
@@ -202,7 +210,7 @@ class RefreshData():
 
         district_info_comm = districts_candidates_commissioners(link_source='absolute', redistricting_year=2022)
 
-        district_info_comm['openanc_link'] = district_info_comm['smd_id'].apply(lambda x: generate_url(x, link_source='absolute'))
+        district_info_comm['openanc_link'] = generate_urls(district_info_comm['smd_id'], link_source='absolute')
 
         columns_to_publish = ['smd_id', 'number_of_candidates', 'list_of_candidate_names', 'openanc_link']
 
@@ -219,7 +227,7 @@ class RefreshData():
 
         # Commissioners currently active
         commissioners = list_commissioners(status='current')
-        districts = pd.read_csv('data/districts.csv')
+        districts = load_csv('data/districts.csv')
 
         if len(commissioners) == 0:
             print('There are no current commissioners in the database to publish to Google Sheets.')
@@ -239,7 +247,7 @@ class RefreshData():
         if len(twttr) != 345:
             raise ValueError('The number of districts to publish to Google Sheets is not correct.')
 
-        twttr['openanc_link'] = twttr['smd_id'].apply(lambda x: generate_url(x, link_source='absolute'))
+        twttr['openanc_link'] = generate_urls(twttr['smd_id'], link_source='absolute')
 
         twttr['commissioner_name'] = twttr['full_name']
         columns_to_publish = [
@@ -265,10 +273,10 @@ class RefreshData():
         Publish list of ANCs to OpenANC Published
         """
 
-        ancs = pd.read_csv('data/ancs.csv')
+        ancs = load_csv('data/ancs.csv')
         ancs = ancs[ancs.redistricting_year == config.current_redistricting_year].copy()
 
-        ancs['openanc_link'] = ancs['anc_id'].apply(lambda x: generate_url(x, link_source='absolute'))
+        ancs['openanc_link'] = generate_urls(ancs['anc_id'], link_source='absolute')
 
         columns_to_publish = [
             'anc_id'
@@ -293,8 +301,8 @@ class RefreshData():
         """
 
         candidates = list_candidates(election_year=2020)
-        results = pd.read_csv('data/results.csv')
-        write_in_winners = pd.read_csv('data/write_in_winners.csv')
+        results = load_csv('data/results.csv')
+        write_in_winners = load_csv('data/write_in_winners.csv')
 
         cp = pd.merge(
             candidates[['candidate_id', 'person_id', 'smd_id', 'candidate_status']]
@@ -401,6 +409,7 @@ class RefreshData():
 
             destination_path = f'data/{csv_name}.csv'
             df.to_csv(destination_path, index=False)
+            write_csv_cache(destination_path)
             print(f'Data written to: {destination_path}')
 
 
@@ -408,7 +417,7 @@ class RefreshData():
     def confirm_column_notnull_candidates(self):
         """Throw an error if a column has NULLs in it, if those NULLs are not supposed to be there"""
 
-        df = pd.read_csv('data/candidates.csv')
+        df = load_csv('data/candidates.csv')
         df = df[df.election_year == config.current_election_year].copy()
         col = 'updated_at'
         table = 'candidates'
@@ -424,7 +433,7 @@ class RefreshData():
     def confirm_commissioner_date_validity(self):
         """Confirm that end dates are after start dates for every commissioner record."""
 
-        commissioners = pd.read_csv('data/commissioners.csv')
+        commissioners = load_csv('data/commissioners.csv')
 
         invalid_dates = commissioners.start_date > commissioners.end_date
         
@@ -438,7 +447,7 @@ class RefreshData():
     def confirm_one_person_per_candidate_election_year(self):
         """Each person should only be in the candidates table once in an election year."""
 
-        candidates = pd.read_csv('data/candidates.csv')
+        candidates = load_csv('data/candidates.csv')
         person_election_year = candidates.groupby(['election_year', 'person_id', 'candidate_name']).size()
 
         if any(person_election_year > 1):
@@ -450,7 +459,7 @@ class RefreshData():
     def add_name_id_to_people_csv(self):
         """Calculate the name slug once for the people CSV and save it"""
 
-        people = pd.read_csv('data/people.csv')
+        people = load_csv('data/people.csv')
         people['person_name_id'] = 'person_' + people.full_name.apply(lambda x: format_name_for_url(x))
         people.to_csv('data/people.csv', index=False)
 
@@ -505,7 +514,7 @@ class RefreshData():
             print('Good matches saved to: data/add_to_external_id_lookup.csv')
 
         if len(people_create) > 0:
-            people = pd.read_csv('data/people.csv')
+            people = load_csv('data/people.csv')
             max_id_person = people['person_id'].max()
 
             people_create['full_name'] = people_create[name_column].str.title()
@@ -546,11 +555,11 @@ class RefreshData():
         This should be run every time refresh_data is run because today's date changes.
         """
 
-        candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+        candidate_statuses = load_csv('data/candidate_statuses.csv')
         candidate_statuses.set_index('candidate_status', inplace=True)
         candidate_statuses['count_as_candidate'] = candidate_statuses['count_as_candidate'].astype(bool)
 
-        election_dates = pd.read_csv('data/election_dates.csv')
+        election_dates = load_csv('data/election_dates.csv')
         election_dates.set_index('election_year', inplace=True)
 
         date_cols = [col for col in election_dates.columns if col[-5:] == '_date']
@@ -580,7 +589,7 @@ class RefreshData():
         self.refresh_csv('commissioners', 'A:E')
         self.refresh_csv('external_id_lookup', 'A:D')
 
-        self.lookup = pd.read_csv('data/external_id_lookup.csv')
+        self.lookup = load_csv('data/external_id_lookup.csv')
         self.people = people_dataframe()
 
         # Related to election results
@@ -0,0 +1,82 @@
+"""
+HTML templates from templates/, parsed once and filled in with a single pass
+
+Templates mark the spots to fill in with placeholders of two kinds:
+REPLACE_WITH_SMD_NAME and <!-- replace with commissioner table -->.
+
+Each placeholder is a slot, named by lowercasing its text and joining the words with underscores,
+so those two slots are 'smd_name' and 'commissioner_table'. Placeholders whose slot isn't given
+a value are left in the page as they are, just like a str.replace() that was never called.
+"""
+
+import re
+from functools import lru_cache
+
+
+
+placeholder_pattern = re.compile(r'REPLACE_WITH_[A-Z0-9_]+|<!-- replace with [^>]+? -->')
+
+
+
+class Template():
+
+    def __init__(self, text):
+
+        # List of (slot name, text) tuples. Literal text has a slot name of None.
+        # For a placeholder, the text is the placeholder itself, used when the slot has no value.
+        self.segments = []
+
+        position = 0
+
+        for match in placeholder_pattern.finditer(text):
+
+            if match.start() > position:
+                self.segments += [(None, text[position:match.start()])]
+
+            self.segments += [(slot_name(match.group()), match.group())]
+            position = match.end()
+
+        if position < len(text):
+            self.segments += [(None, text[position:])]
+
+
+
+    @property
+    def slot_names(self):
+        """Set of the slots in this template"""
+
+        return {name for name, _ in self.segments if name}
+
+
+
+    def render(self, slots):
+        """
+        Return the template text with each placeholder replaced by its value from the dict slots
+        """
+
+        return ''.join(
+            text if name is None or name not in slots else str(slots[name])
+            for name, text in self.segments
+            )
+
+
+
+def slot_name(placeholder):
+    """
+    Return the slot name of a placeholder
+
+    REPLACE_WITH_LINK_PATH___ becomes 'link_path', <!-- replace with old/new heading --> becomes 'old_new_heading'
+    """
+
+    name = placeholder.replace('REPLACE_WITH_', '').replace('<!-- replace with ', '').replace(' -->', '')
+
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+
+@lru_cache(maxsize=None)
+def load_template(template_name):
+    """Return the Template for a file in templates/, reading and parsing it only once"""
+
+    with open(f'templates/{template_name}', 'r') as f:
+        return Template(f.read())
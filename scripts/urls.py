@@ -2,6 +2,99 @@
 Functions for handling URLs within the OpenANC project
 """
 
+import pandas as pd
+from functools import lru_cache
+
+
+
+slug_items_to_strip_out = ['2022', 'smd_', 'anc_', 'ward_', 'person_', '_', '/']
+
+redistricting_years = [2012, 2022]
+
+# The relative link from each source page to each destination page, keyed by (source, destination)
+link_prefix_templates = {
+    ('root', 'root'): ''
+    , ('root', 'anc'): 'map_{redistricting_year}/ancs/'
+    , ('root', 'ward'): 'map_{redistricting_year}/wards/'
+    , ('root', 'district'): 'map_{redistricting_year}/ancs/districts/'
+    , ('root', 'person'): 'people/'
+
+    , ('anc', 'root'): '../../'
+    , ('anc', 'anc'): '../../map_{redistricting_year}/ancs/'
+    , ('anc', 'district'): '../../map_{redistricting_year}/ancs/districts/'
+    , ('anc', 'person'): '../../people/'
+
+    , ('ward', 'root'): '../../'
+    , ('ward', 'ward'): '../../map_{redistricting_year}/wards/'
+    , ('ward', 'district'): '../../map_{redistricting_year}/ancs/districts/'
+    , ('ward', 'person'): '../../people/'
+
+    , ('district', 'root'): '../../../'
+    , ('district', 'ward'): '../map_{redistricting_year}/wards/'
+    , ('district', 'anc'): '../../map_{redistricting_year}/ancs/'
+    , ('district', 'district'): '../../../map_{redistricting_year}/ancs/districts/'
+    , ('district', 'person'): '../../../people/'
+
+    , ('person', 'root'): '../'
+    , ('person', 'district'): '../map_{redistricting_year}/ancs/districts/'
+    , ('person', 'person'): ''
+
+    , ('absolute', 'root'): 'https://openanc.org/'
+    , ('absolute', 'anc'): 'https://openanc.org/map_{redistricting_year}/ancs/'
+    , ('absolute', 'district'): 'https://openanc.org/map_{redistricting_year}/ancs/districts/'
+    , ('absolute', 'person'): 'https://openanc.org/people/'
+    }
+
+
+
+def build_link_prefixes():
+    """
+    Return dictionary with every prefix in link_prefix_templates filled in for each redistricting year
+
+    Keyed by (source, destination, redistricting_year as a string), or by (source, destination, None)
+    for the prefixes that are the same in every redistricting year.
+    """
+
+    link_prefixes = {}
+
+    for (source, destination), template in link_prefix_templates.items():
+        if '{redistricting_year}' in template:
+            for redistricting_year in redistricting_years:
+                link_prefixes[source, destination, str(redistricting_year)] = template.format(redistricting_year=redistricting_year)
+        else:
+            link_prefixes[source, destination, None] = template
+
+    return link_prefixes
+
+
+
+link_prefixes = build_link_prefixes()
+
+
+
+def build_url_prefixes():
+    """
+    Return dictionary of the prefixes in link_prefixes for each source, keyed by (destination, redistricting_year)
+
+    Prefixes that are the same in every redistricting year are repeated for each year,
+    so that generate_urls() can find the prefix of every page with one lookup.
+    """
+
+    url_prefixes = {}
+
+    for (source, destination, redistricting_year), link_prefix in link_prefixes.items():
+        years = [int(redistricting_year)] if redistricting_year else redistricting_years
+
+        for year in years:
+            url_prefixes.setdefault(source, {})[destination, year] = link_prefix
+
+    return url_prefixes
+
+
+
+url_prefixes = build_url_prefixes()
+
+
 
 def generate_link(page_id, link_body, link_source='root'):
     """
@@ -21,6 +114,21 @@ def generate_url(page_id, link_source='root'):
     The page_id sent to this function for a person must be the person_name_id
     """
 
+    destination, redistricting_year = page_destination(page_id)
+
+    return (
+        relative_link_prefix(source=link_source, destination=destination, redistricting_year=redistricting_year)
+        + link_slug(page_id) + '.html'
+        )
+
+
+
+@lru_cache(maxsize=None)
+def page_destination(page_id):
+    """
+    Return tuple of the type of page and the redistricting year that page_id links to, such as ('district', 2022)
+    """
+
     if page_id.startswith('smd_'):
         destination = 'district'
     elif page_id.startswith('anc_'):
@@ -37,10 +145,53 @@ def generate_url(page_id, link_source='root'):
     else:
         redistricting_year = 2012
 
-    return (
+    return destination, redistricting_year
+
+
+
+def generate_links(page_ids, link_bodies, link_source='root'):
+    """
+    Return Series with a relative internal link to each page in page_ids, the Series version of generate_link()
+
+    link_bodies is a Series with the same index as page_ids, or a list in the same order as page_ids.
+    """
+
+    urls = generate_urls(page_ids, link_source=link_source)
+
+    if isinstance(link_bodies, pd.Series):
+        if not link_bodies.index.equals(urls.index):
+            raise ValueError('The index of link_bodies does not match the index of page_ids.')
+    else:
+        link_bodies = pd.Series(link_bodies, index=urls.index)
+
+    # map(str) writes a missing body as 'nan', like generate_link(), and astype(str) keeps empty input a text Series
+    return '<a href="' + urls + '">' + link_bodies.map(str).astype(str) + '</a>'
+
+
+
+def generate_urls(page_ids, link_source='root'):
+    """
+    Return Series with a relative link to each page in page_ids from a source page, the Series version of generate_url()
+
+    The destination and slug of each page_id are memoized, so a page_id seen before costs two dictionary lookups,
+    and the prefix of each page is one lookup in url_prefixes.
+    """
+
+    if not isinstance(page_ids, pd.Series):
+        page_ids = pd.Series(page_ids, dtype=object)
+
+    page_ids = page_ids.astype(str)
+
+    destinations = page_ids.map(page_destination)
+    prefixes = destinations.map(url_prefixes.get(link_source, {}).get)
+
+    missing = prefixes.isna()
+    if missing.any():
+        # Raises the ValueError for the first combination that is not in url_prefixes
+        destination, redistricting_year = destinations[missing].iloc[0]
         relative_link_prefix(source=link_source, destination=destination, redistricting_year=redistricting_year)
-        + link_slug(page_id) + '.html'
-        )
+
+    return prefixes.astype(str) + link_slugs(page_ids) + '.html'
 
 
 
@@ -51,78 +202,24 @@ def relative_link_prefix(source, destination, redistricting_year='xxxx'):
     For instance:
     relative_link_prefix(source='anc', destination='person') : use this when linking to a person page from an ANC page
     relative_link_prefix(source='person', destination='district', redistricting_year=2022) : use this when linking to a 2022 district page from a person page
+
+    The prefix is looked up in link_prefixes, which is built when this module is imported.
     """
 
-    link_prefix = 'xxxx'
-
-    if source == 'root':
-        if destination == 'root':
-            link_prefix = ''
-        elif destination == 'anc':
-            link_prefix = f'map_{redistricting_year}/ancs/'
-        elif destination == 'ward':
-            link_prefix = f'map_{redistricting_year}/wards/'
-        elif destination == 'district':
-            link_prefix = f'map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = 'people/'
-
-    elif source == 'anc':
-        if destination == 'root':
-            link_prefix = '../../'
-        elif destination == 'anc':
-            link_prefix = f'../../map_{redistricting_year}/ancs/'
-        elif destination == 'district':
-            link_prefix = f'../../map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = '../../people/'
-
-    elif source == 'ward':
-        if destination == 'root':
-            link_prefix = '../../'
-        elif destination == 'ward':
-            link_prefix = f'../../map_{redistricting_year}/wards/'
-        elif destination == 'district':
-            link_prefix = f'../../map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = '../../people/'
-
-    elif source == 'district':
-        if destination == 'root':
-            link_prefix = '../../../'
-        elif destination == 'ward':
-            link_prefix = f'../map_{redistricting_year}/wards/'
-        elif destination == 'anc':
-            link_prefix = f'../../map_{redistricting_year}/ancs/'
-        elif destination == 'district':
-            link_prefix = f'../../../map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = '../../../people/'
-
-    elif source == 'person':
-        if destination == 'root':
-            link_prefix = '../'
-        elif destination == 'district':
-            link_prefix = f'../map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = ''
-
-    elif source == 'absolute':
-        if destination == 'root':
-            link_prefix = 'https://openanc.org/'
-        elif destination == 'anc':
-            link_prefix = f'https://openanc.org/map_{redistricting_year}/ancs/'
-        elif destination == 'district':
-            link_prefix = f'https://openanc.org/map_{redistricting_year}/ancs/districts/'
-        elif destination == 'person':
-            link_prefix = 'https://openanc.org/people/'
-
-
-    """
-    If 'xxxx' is in the link_prefix, this means that the source-destination combination has not been defined yet,
-    or that a redistricting_year needed to be supplied but was not. 
-    """
-    if 'xxxx' in link_prefix:
+    link_prefix = link_prefixes.get((source, destination, None))
+
+    if link_prefix is None:
+        link_prefix = link_prefixes.get((source, destination, str(redistricting_year)))
+
+    # A redistricting year that isn't in the table is filled into the template directly
+    if link_prefix is None and (source, destination) in link_prefix_templates:
+        link_prefix = link_prefix_templates[source, destination].format(redistricting_year=redistricting_year)
+
+    """
+    If there is no prefix, this means that the source-destination combination has not been defined yet.
+    If 'xxxx' is in the link_prefix, a redistricting_year needed to be supplied but was not.
+    """
+    if link_prefix is None or 'xxxx' in link_prefix:
         raise ValueError(
             'Link prefix not yet implemented for this combination. '
             + f'source: {source}, destination: {destination}, redistricting_year: {redistricting_year}'
@@ -132,21 +229,29 @@ def relative_link_prefix(source, destination, redistricting_year='xxxx'):
 
 
 
+@lru_cache(maxsize=None)
 def link_slug(smd_id):
     """
     Generate the final part of a district URL, that will go before the '.html'
     """
 
-    items_to_strip_out = ['2022', 'smd_', 'anc_', 'ward_', 'person_', '_', '/']
-
     slug = smd_id
-    for i in items_to_strip_out:
+    for i in slug_items_to_strip_out:
         slug = slug.replace(i, '')
 
     return slug
 
 
 
+def link_slugs(page_ids):
+    """
+    Return Series with the final part of the URL of each page in page_ids, from the memoized link_slug()
+    """
+
+    return page_ids.map(link_slug)
+
+
+
 def format_name_for_url(name):
     """
     Strip out the non-ASCII characters from a person's full name to use as the URL.
@@ -5,23 +5,27 @@ Build Ward pages
 import hashlib
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import geopandas as gpd
 
 import config
 
+from scripts.data_store import load_csv
+from scripts.template import load_template
+
 from scripts.common import (
     build_smd_html_table
-    , add_footer
+    , footer_html
     , add_google_analytics
-    , add_geojson
-    , ward_geojson
+    , google_analytics_html
+    , shape_bounds
+    , html_table
     , mapbox_slugs
+    , build_pages
+    , write_html
     )
 
 from scripts.urls import (
     generate_url
-    , generate_link
+    , generate_links
     , relative_link_prefix
     )
 
@@ -32,13 +36,13 @@ from scripts.data_transformations import districts_candidates_commissioners
 class BuildWards():
 
     def __init__(self):
-        self.geojson_shape = ward_geojson()
+        self.ward_bounds = shape_bounds('ward')
         self.mapbox_style_slugs = mapbox_slugs()
 
-        self.districts = pd.read_csv('data/districts.csv')
-        self.mapbox_styles = pd.read_csv('data/mapbox_styles.csv')
-        self.wards = pd.read_csv('data/wards.csv')
-        self.candidate_statuses = pd.read_csv('data/candidate_statuses.csv')
+        self.districts = load_csv('data/districts.csv')
+        self.mapbox_styles = load_csv('data/mapbox_styles.csv')
+        self.wards = load_csv('data/wards.csv')
+        self.candidate_statuses = load_csv('data/candidate_statuses.csv')
         self.dcc = districts_candidates_commissioners(link_source='ward')
 
 
@@ -57,8 +61,7 @@ class BuildWards():
 
         output = output.replace('REPLACE_WITH_LIST_VALUES', self.list_of_wards(redistricting_year))
         
-        with open(f'docs/map_{redistricting_year}/wards/index.html', 'w') as f:
-            f.write(output)
+        write_html(f'docs/map_{redistricting_year}/wards/index.html', output)
 
 
 
@@ -70,79 +73,84 @@ class BuildWards():
             )
 
         display_df = ward_districts.groupby(['ward_id', 'ward_name', 'councilmember']).agg(count_of_smds=('smd_id', 'size')).reset_index()
-        display_df['Ward'] = display_df.apply(lambda x: generate_link(x.ward_id, x.ward_name, link_source='ward'), axis=1)
+        display_df['Ward'] = generate_links(display_df.ward_id, display_df.ward_name, link_source='ward')
         display_df['Council Member'] = display_df['councilmember']
         display_df['Count of SMDs'] = display_df['count_of_smds']
 
         columns_to_html = ['Ward', 'Council Member', 'Count of SMDs']
 
-        html = (
-            display_df[columns_to_html]
-            .fillna('')
-            .style
-            .set_uuid('list_of_wards_')
-            .hide(axis='index')
-            .to_html()
-            )
+        html = html_table(display_df[columns_to_html].fillna(''))
 
         return html
 
 
 
-    def build_all_ward_pages(self):
+    def build_all_ward_pages(self, jobs=1, manifest=None):
         """Build pages for each ward"""
 
-        for _, ward in tqdm(self.wards.iterrows(), total=len(self.wards), desc='Wards  '):
-            self.build_ward_page(ward)
+        build_pages(self, 'build_ward_page', self.wards, desc='Wards  ', jobs=jobs, manifest=manifest)
 
 
 
-    def build_ward_page(self, ward):
-        """Build one ward page"""
+    def page_path(self, ward):
+        """Path of the page for one ward"""
+
+        return 'docs/' + generate_url(ward.ward_id, link_source='root')
+
+
+
+    def page_inputs(self, ward):
+        """
+        List everything the page for one ward is built from, for incremental builds
+        """
 
-        with open('templates/ward.html', 'r') as f:
-            output = f.read()
-        
-        output = add_google_analytics(output)
-        output = add_geojson(self.geojson_shape, 'ward_id', ward.ward_id, output)
-        
-        output = output.replace('REPLACE_WITH_MAPBOX_GL_JS_VERSION', config.mapbox_gl_js_version)
-        output = output.replace('REPLACE_WITH_WARD_NAME', f'{ward.ward_name} [{ward.redistricting_cycle} Cycle]')
-        output = output.replace('REPLACE_WITH_CM', ward.councilmember)
-        
         ward_smd_ids = self.districts[self.districts['ward_id'] == ward.ward_id]['smd_id'].to_list()
-        output = output.replace(
-            '<!-- replace with district list -->'
-            , build_smd_html_table(ward_smd_ids, link_source='ward', district_comm_commelect=self.dcc, candidate_statuses=self.candidate_statuses)
-            )
 
-        if ward.ward_name in (3,4):
-            output = output.replace(
-                '<!-- replace with 3/4 info -->'
-                , '<p>Note that the Single Member Districts 3G01, 3G02, 3G03, and 3G04 are a part of ANC 3G but located in Ward 4.</p>'
-                )
+        return [
+            ward
+            , self.dcc[self.dcc['smd_id'].isin(ward_smd_ids)]
+            , self.dcc.number_of_candidates.sum() > 0
+            ]
+
+
+
+    def build_ward_page(self, ward):
+        """Build one ward page"""
 
         if ward.redistricting_year == 2012:
             mapbox_slug_id = 'smd'
         else:
             mapbox_slug_id = 'smd-2022'
 
-        output = output.replace('REPLACE_WITH_MAPBOX_SLUG', self.mapbox_style_slugs[mapbox_slug_id])
-        output = output.replace('REPLACE_WITH_LONGITUDE', '-77.03412954884507')
-        output = output.replace('REPLACE_WITH_LATITUDE', '38.9361129455516')
-        output = output.replace('REPLACE_WITH_ZOOM_LEVEL', '11')
+        ward_smd_ids = self.districts[self.districts['ward_id'] == ward.ward_id]['smd_id'].to_list()
+
+        slots = {
+            'google_analytics': google_analytics_html
+            , 'xy': self.ward_bounds[ward.ward_id]
+            , 'mapbox_gl_js_version': config.mapbox_gl_js_version
+            , 'ward_name': f'{ward.ward_name} [{ward.redistricting_cycle} Cycle]'
+            , 'cm': ward.councilmember
+            , 'district_list': build_smd_html_table(ward_smd_ids, link_source='ward', district_comm_commelect=self.dcc, candidate_statuses=self.candidate_statuses)
+            , 'mapbox_slug': self.mapbox_style_slugs[mapbox_slug_id]
+            , 'longitude': '-77.03412954884507'
+            , 'latitude': '38.9361129455516'
+            , 'zoom_level': '11'
+            , 'footer': footer_html(link_source='ward')
+            }
+
+        if ward.ward_name in (3,4):
+            slots['3_4_info'] = '<p>Note that the Single Member Districts 3G01, 3G02, 3G03, and 3G04 are a part of ANC 3G but located in Ward 4.</p>'
 
-        output = add_footer(output, link_source='ward')
+        output = load_template('ward.html').render(slots)
 
-        with open('docs/' + generate_url(ward.ward_id, link_source='root'), 'w') as f:
-            f.write(output)
+        write_html(self.page_path(ward), output)
 
 
 
-    def run(self):
+    def run(self, jobs=1, manifest=None):
 
         for ry in [2012, 2022]:
             self.ward_list_page(redistricting_year=ry)
 
-        self.build_all_ward_pages()
+        self.build_all_ward_pages(jobs, manifest)
 
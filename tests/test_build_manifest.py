@@ -0,0 +1,27 @@
+import pandas as pd
+
+from scripts.build_manifest import *
+
+
+
+def test_manifest_skips_unchanged_page(tmp_path):
+    """A page is current only if its inputs are unchanged and the file still exists"""
+
+    page_path = str(tmp_path / 'page.html')
+    manifest = BuildManifest(path=tmp_path / 'build_manifest.json')
+
+    row = pd.Series({'smd_id': 'smd_2022_1A01', 'full_name': 'Jane Doe'})
+    page_fingerprint = manifest.page_fingerprint([row])
+    manifest.record(page_path, page_fingerprint)
+    manifest.save()
+
+    reloaded = BuildManifest(path=tmp_path / 'build_manifest.json')
+    assert not reloaded.is_current(page_path, page_fingerprint)
+
+    with open(page_path, 'w') as f:
+        f.write('<html></html>')
+
+    assert reloaded.is_current(page_path, page_fingerprint)
+
+    row['full_name'] = 'Jane Q. Doe'
+    assert not reloaded.is_current(page_path, reloaded.page_fingerprint([row]))
@@ -27,6 +27,121 @@ def test_ward_geojson():
 
 
 
+def test_shape_bounds():
+    """Bounds from the cached table match bounds calculated from the GeoJSON"""
+
+    bounds = shape_bounds('ward')
+    assert len(bounds) == 16
+
+    gdf = ward_geojson()
+    minx, miny, maxx, maxy = gdf[gdf.ward_id == 'ward_1_2022'].geometry.bounds.iloc[0]
+    assert bounds['ward_1_2022'] == f'[[[{minx}, {miny}]\n,[{maxx}, {maxy}]\n]]'
+
+
+
+def test_hash_dataframe():
+    """Each id is the hash of the row's values joined by commas, plus string_to_add"""
+
+    df = pd.DataFrame({'smd_id': ['smd_2022_1A01', 'smd_2022_1A02'], 'candidate_name_upper': ['JANE DOE', 'JOHN DOE']})
+
+    expected = [hashlib.sha224(f'{s},{n}2024_votes'.encode()).hexdigest() for s, n in zip(df.smd_id, df.candidate_name_upper)]
+
+    assert hash_dataframe(df, ['smd_id', 'candidate_name_upper'], string_to_add='2024_votes') == expected
+    assert hash_dataframe(df, ['smd_id', 'candidate_name_upper'], string_to_add='2024_votes', jobs=2) == expected
+
+
+
+def test_write_html_ignores_updated_at(tmp_path):
+    """A page that only differs by its "Last updated" date is rewritten unless that date is ignored"""
+
+    html_path = tmp_path / 'page.html'
+    html_path.write_text('<p>Hello</p><p>Last updated: July 18, 2026</p>')
+
+    keep_unchanged_dates(True)
+    try:
+        assert not write_html(html_path, '<p>Hello</p><p>Last updated: October 18, 2026</p>')
+        assert write_html(html_path, '<p>Goodbye</p><p>Last updated: October 18, 2026</p>')
+    finally:
+        keep_unchanged_dates(False)
+
+    assert not write_html(html_path, '<p>Goodbye</p><p>Last updated: October 18, 2026</p>')
+    assert write_html(html_path, '<p>Goodbye</p><p>Last updated: October 19, 2026</p>')
+
+
+
+class DatedPageBuilder():
+
+    def __init__(self, html_dir):
+        self.html_dir = html_dir
+
+    def build_page(self, row):
+        write_html(f'{self.html_dir}/{row.page}.html', f'<p>{row.page}</p><p>Last updated: October 18, 2026</p>')
+
+
+
+def test_build_pages_spawned_workers_keep_unchanged_dates(tmp_path, monkeypatch):
+    """Workers started by spawn get the --keep-unchanged-dates setting from build_pages()"""
+
+    for page in ['a', 'b']:
+        (tmp_path / f'{page}.html').write_text(f'<p>{page}</p><p>Last updated: July 18, 2026</p>')
+
+    monkeypatch.setattr(multiprocessing, 'Pool', multiprocessing.get_context('spawn').Pool)
+
+    keep_unchanged_dates(True)
+    try:
+        build_pages(DatedPageBuilder(str(tmp_path)), 'build_page', pd.DataFrame({'page': ['a', 'b']}), desc='Test', jobs=2)
+    finally:
+        keep_unchanged_dates(False)
+
+    assert (tmp_path / 'a.html').read_text() == '<p>a</p><p>Last updated: July 18, 2026</p>'
+    assert (tmp_path / 'b.html').read_text() == '<p>b</p><p>Last updated: July 18, 2026</p>'
+
+
+
+def test_html_table():
+    """Alignment, formats, highlights and the total row come out as classes on each cell"""
+
+    df = pd.DataFrame({'Name': ['A', 'Total'], 'Share': [0.25, 1.0]})
+
+    html = html_table(
+        df
+        , align={'Name': 'left'}
+        , formats={'Share': '{:.0%}'.format}
+        , highlight={'Share': lambda x: x >= 0.5}
+        , bold_last_row=True
+        )
+
+    assert '<td class="data align_left">A</td>' in html
+    assert '<td class="data">25%</td>' in html
+    assert '<tr class="total_row">' in html
+    assert '<td class="data highlight">100%</td>' in html
+
+
+
+def test_html_table_classes_have_styles():
+    """Every class html_table() puts on the tables of the site has a rule in docs/nonmap.css"""
+
+    df = pd.DataFrame({'Name': ['A', 'Total Votes'], 'Votes': [5, 5], 'Share': [0.25, 1.0]})
+
+    html = html_table(
+        df
+        , align={'Name': 'left', 'Votes': 'right', 'Share': 'center'}
+        , width={'Name': 230}
+        , highlight={'Share': lambda x: x >= 0.5}
+        , bold_last_row=True
+        , show_index=True
+        )
+
+    with open('docs/nonmap.css') as f:
+        css = f.read()
+
+    classes = set(' '.join(re.findall(r'class="([^"]*)"', html)).split()) - {'blank'}
+
+    assert {'align_left', 'align_right', 'width_230', 'highlight', 'total_row'} <= classes
+    assert [c for c in classes if not re.search(rf'\.{c}\b[^{{]*{{', css)] == []
+
+
+
 # def test_mapbox_slugs():
 
 #     ms = mapbox_slugs()
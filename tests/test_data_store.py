@@ -0,0 +1,53 @@
+import pytest
+
+from scripts.data_store import *
+
+
+
+def test_load_csv_returns_copy(tmp_path):
+    """Changing a frame returned by the store should not change the stored table"""
+
+    csv_path = tmp_path / 'table.csv'
+    csv_path.write_text('a,b\n1,2\n')
+
+    ds = DataStore()
+    df = ds.load_csv(csv_path)
+    df['a'] = 100
+
+    assert ds.load_csv(csv_path).loc[0, 'a'] == 1
+
+
+
+def test_load_csv_rereads_changed_file(tmp_path):
+    """A CSV that is rewritten should be parsed again"""
+
+    csv_path = tmp_path / 'table.csv'
+    csv_path.write_text('a,b\n1,2\n')
+
+    ds = DataStore()
+    assert len(ds.load_csv(csv_path)) == 1
+
+    csv_path.write_text('a,b\n1,2\n3,4\n')
+    assert len(ds.load_csv(csv_path)) == 2
+
+
+
+@pytest.mark.skipif(feather is None, reason='binary cache needs pyarrow')
+def test_csv_cache_survives_partial_files(tmp_path, monkeypatch):
+    """Rewriting a binary copy leaves one complete file, and a truncated copy falls back to the CSV"""
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    csv_path = 'data/table.csv'
+    with open(csv_path, 'w') as f:
+        f.write('a,b\n1,2\n')
+
+    write_csv_cache(csv_path)
+    write_csv_cache(csv_path)
+
+    assert [p.name for p in cache_dir.iterdir()] == [cache_file_path(csv_path, file_digest(csv_path)).name]
+
+    with open(cache_file_path(csv_path, file_digest(csv_path)), 'r+b') as f:
+        f.truncate(10)
+
+    assert read_csv_cached(csv_path).loc[0, 'b'] == 2
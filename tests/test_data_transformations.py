@@ -0,0 +1,37 @@
+
+from scripts.data_transformations import *
+
+
+
+def test_commissioner_timeline():
+    """Status of each commissioner at a date_point, with outputs reused for date_points with the same statuses"""
+
+    timeline = CommissionerTimeline(pd.DataFrame({
+        'person_id': [1, 2, 3]
+        , 'smd_id': ['smd_2022_1A01', 'smd_2022_1A01', 'smd_2022_1A02']
+        , 'commissioner_name': ['A', 'B', 'C']
+        , 'start_date': ['2019-01-02', '2023-01-02', '2023-01-02']
+        , 'end_date': ['2023-01-02', '2025-01-02', '2027-01-02']
+        }))
+
+    date_point = pd.Timestamp('2024-06-01', tz=config.site_timezone)
+
+    assert timeline.list_commissioners('current', date_point).person_id.to_list() == [2, 3]
+    assert timeline.list_commissioners('former', date_point).person_id.to_list() == [1]
+    assert timeline.list_commissioners('current', pd.Timestamp('2026-06-01', tz=config.site_timezone)).person_id.to_list() == [3]
+    assert timeline.list_commissioners(date_point=date_point).term_in_office.iloc[0] == '~2019 to January 2, 2023'
+
+    timeline.list_commissioners('current', pd.Timestamp('2024-07-01', tz=config.site_timezone))
+    assert len([key for key in timeline.outputs if key[0] == 'current']) == 2
+
+
+
+def test_districts_candidates_commissioners_cached():
+    """Each call returns its own copy, and the link-free core is shared across link_sources"""
+
+    anc = districts_candidates_commissioners(link_source='anc')
+    anc['smd_name'] = 'changed'
+
+    assert (districts_candidates_commissioners(link_source='anc').smd_name != 'changed').all()
+    assert (districts_candidates_commissioners().list_of_candidate_names == anc.list_of_candidate_names).all()
+    assert districts_candidates_commissioners_core.cache_info().currsize == 1
@@ -0,0 +1,110 @@
+
+import pytest
+
+from scripts.match_people import *
+
+
+
+def test_best_matches():
+    """Each name gets its k closest people, best first, with their name and SMD"""
+
+    people = pd.DataFrame({
+        'person_id': [1, 2, 3]
+        , 'full_name': ['Max Ewart', 'Maxine Ewart-Jones', 'Jane Doe']
+        , 'most_recent_smd_id': ['smd_2022_1A01', 'smd_2022_1A02', 'smd_2022_2B01']
+        })
+
+    matches = best_matches(['max ewart', 'Jane Doe.'], people, k=2)
+
+    assert matches.search_position.to_list() == [0, 0, 1, 1]
+    assert matches.match_person_id.to_list()[::2] == [1, 3]
+    assert matches.match_score.to_list()[::2] == [100, 100]
+    assert matches.match_smd_id.to_list()[1] == 'smd_2022_1A02'
+
+
+
+def test_name_similarity_matrix_matches_fuzzywuzzy():
+    """
+    Scores are the same as fuzzywuzzy's default processing and fuzz.ratio with python-Levenshtein installed.
+    'Ann Lena' and 'Dean Anna' score 59 on the Indel ratio but 47 with difflib, so this checks the rapidfuzz branch.
+    """
+
+    rapidfuzz = pytest.importorskip('rapidfuzz')
+
+    search_names = ['Jon Smith', "Mary O'Neil", 'Ann Lena']
+    names = ['John Smith', 'Mary ONeil', 'J. Smyth', 'Dean Anna']
+
+    expected = [
+        [round(rapidfuzz.fuzz.ratio(normalize_name(s), normalize_name(n))) for n in names]
+        for s in search_names
+        ]
+
+    assert expected[2][3] == 59
+    assert name_similarity_matrix(search_names, names).tolist() == expected
+
+
+
+def test_name_similarity_matrix_without_rapidfuzz(monkeypatch):
+    """Without rapidfuzz, scores are the same as fuzzywuzzy's fuzz.ratio"""
+
+    monkeypatch.setattr('scripts.match_people.rapidfuzz_process', None)
+
+    search_names = ['Jon Smith', "Mary O'Neil"]
+    names = ['John Smith', 'Mary ONeil', 'J. Smyth']
+
+    expected = [[fuzz.ratio(normalize_name(s), normalize_name(n)) for n in names] for s in search_names]
+
+    assert name_similarity_matrix(search_names, names).tolist() == expected
+
+
+
+def test_soundex():
+
+    assert soundex('Robert') == soundex('Rupert') == 'R163'
+    assert soundex('Ashcraft') == 'A261'
+    assert soundex('Tymczak') == 'T522'
+
+
+
+def test_people_blocks():
+    """Names are only scored against people who share a blocking key, or against everyone if no one does"""
+
+    people = pd.DataFrame({
+        'person_id': [1, 2, 3]
+        , 'full_name': ['Max Ewart', 'Maxine Ewart-Jones', 'Jane Doe']
+        , 'most_recent_smd_id': ['smd_2022_1A01', 'smd_2022_1A02', 'smd_2022_2B01']
+        })
+
+    blocks = PeopleBlocks(people)
+
+    assert blocks.candidate_positions('max ewart').tolist() == [0, 1]
+    assert blocks.candidate_positions('jane dow').tolist() == [2]
+    assert blocks.candidate_positions('jane smith', 'smd_2022_1A02').tolist() == [1]
+    assert blocks.candidate_positions('prince').tolist() == [0, 1, 2]
+
+    matches = best_matches(['Jane Dow', 'Max Ewart Jr.'], people, smd_ids=[None, 'smd_2022_1A01'], blocks=blocks)
+    assert matches.match_person_id.to_list() == [3, 1]
+
+
+
+def test_match_cache(tmp_path):
+    """Matches are reused from disk while the people table is unchanged, and recomputed once it changes"""
+
+    people = pd.DataFrame({
+        'person_id': [1, 2, 3]
+        , 'full_name': ['Max Ewart', 'Maxine Ewart-Jones', 'Jane Doe']
+        , 'most_recent_smd_id': ['smd_2022_1A01', 'smd_2022_1A02', 'smd_2022_2B01']
+        })
+
+    cache_path = tmp_path / 'match_cache.csv'
+
+    match_cache = MatchCache(people, cache_path)
+    expected = match_cache.best_matches(['Max Ewart', 'Jane Dow'], k=2)
+    match_cache.save()
+
+    match_cache = MatchCache(people, cache_path)
+    assert len(match_cache.matches) == 2
+    pd.testing.assert_frame_equal(match_cache.best_matches(['Max Ewart', 'Jane Dow'], k=2), expected, check_dtype=False)
+
+    people.loc[2, 'full_name'] = 'Jane Dow'
+    assert len(MatchCache(people, cache_path).matches) == 0
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from scripts.precinct_votes import *
+
+
+
+def test_smd_by_precinct():
+    """Each SMD gets a row per precinct with votes, and candidates in order by total votes"""
+
+    pv = PrecinctVotes(pd.DataFrame({
+        'election_year': [2024, 2024, 2024, 2024, 2024, 2024]
+        , 'smd_id': ['smd_2022_1A01', 'smd_2022_1A01', 'smd_2022_1A01', 'smd_2022_1A01', 'smd_2022_1A01', 'smd_2022_1A02']
+        , 'precinct_number': [36, 36, 41, 41, 22, 22]
+        , 'ward_number': [1, 1, 1, 1, 1, 1]
+        , 'candidate_name': ['A', 'B', 'A', 'B', 'A', 'C']
+        , 'votes': [10, 20, 5, 1, 0, 7]
+        }))
+
+    by_precinct = pv.smd_by_precinct(2024, 'smd_2022_1A01')
+
+    assert by_precinct.index.to_list() == [36, 41]
+    assert by_precinct.columns.to_list() == ['B', 'A']
+    assert by_precinct.loc[41, 'A'] == 5
+
+    assert len(pv.smd_by_precinct(2020, 'smd_2022_1A01')) == 0
+    assert pv.smd_rows_all_years('smd_2022_1A01').to_csv() == pv.cube[pv.cube.smd_id == 'smd_2022_1A01'].to_csv()
+    assert len(pv.smd_rows_all_years('smd_2022_9Z99')) == 0
+    assert pv.ward_totals(2024).loc[1] == 43
+
+
+
+def test_precinct_votes_match_candidate_votes():
+    """Summed across precincts, precinct_votes.csv has the same votes as candidate_votes.csv"""
+
+    pv = PrecinctVotes.from_csv()
+    candidate_votes = pd.read_csv('data/dcboe/candidate_votes.csv')
+
+    assert (
+        pv.rollup(['election_year', 'smd_id', 'candidate_name']).to_dict()
+        == candidate_votes.set_index(['election_year', 'smd_id', 'candidate_name']).votes.to_dict()
+        )
+
+
+
+def test_smd_turnout_matches_candidate_votes():
+    """Votes in smd_turnout.csv are the total votes of the candidates in each SMD"""
+
+    smd_turnout = pd.read_csv('data/dcboe/smd_turnout.csv')
+    candidate_votes = pd.read_csv('data/dcboe/candidate_votes.csv')
+
+    assert (
+        smd_turnout.set_index(['election_year', 'smd_id']).votes.to_dict()
+        == candidate_votes.groupby(['election_year', 'smd_id']).votes.sum().to_dict()
+        )
+    assert (smd_turnout.ballots >= smd_turnout.votes).all()
@@ -0,0 +1,27 @@
+
+from scripts.reconcile import *
+
+
+
+def test_reconcile():
+    """Keys are split into both, only left and only right, keeping the order of the list they come from"""
+
+    r = reconcile(['c', 'a', 'b', 'a'], ['b', 'd', 'c'])
+
+    assert r.in_both == ['c', 'b']
+    assert r.only_left == ['a', 'a']
+    assert r.only_right == ['d']
+
+
+
+def test_reconcile_matches_list_scan():
+    """Same result as scanning the other list for each key"""
+
+    left = [f'id_{i}' for i in range(0, 3000, 3)]
+    right = [f'id_{i}' for i in range(0, 3000, 2)]
+
+    r = reconcile(left, right)
+
+    assert r.in_both == [h for h in left if h in right]
+    assert r.only_left == [h for h in left if h not in right]
+    assert r.only_right == [h for h in right if h not in left]
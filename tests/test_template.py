@@ -0,0 +1,16 @@
+from scripts.template import *
+
+
+
+def test_slot_name():
+    assert slot_name('REPLACE_WITH_LINK_PATH___') == 'link_path'
+    assert slot_name('<!-- replace with old/new heading -->') == 'old_new_heading'
+
+
+
+def test_render_leaves_missing_slots():
+    """Placeholders without a value stay in the page, like a replace() that was never called"""
+
+    t = Template('<a href="REPLACE_WITH_LINK_PATH___index.html">REPLACE_WITH_NAME</a><!-- replace with footer -->')
+
+    assert t.render({'link_path': '../', 'name': 'Home'}) == '<a href="../index.html">Home</a><!-- replace with footer -->'
@@ -21,4 +21,40 @@ def test_link_slug():
 
 
 def test_format_name_for_url():
-    assert format_name_for_url('Patrick_O\'Shea') == 'PatrickOShea'
\ No newline at end of file
+    assert format_name_for_url('Patrick_O\'Shea') == 'PatrickOShea'
+
+
+def test_generate_urls():
+    page_ids = pd.Series(['smd_2022_2A01', 'anc_2A', 'person_JaneDoe'])
+    assert generate_urls(page_ids, link_source='anc').to_list() == [generate_url(p, link_source='anc') for p in page_ids]
+
+
+def test_generate_urls_invalid():
+    with pytest.raises(ValueError):
+        generate_urls(['smd_2A01', 'xyz_2A01'])
+
+
+def test_generate_links():
+    assert generate_links(['smd_2A01'], ['A great link'], link_source='anc').to_list() == ['<a href="../../map_2012/ancs/districts/2A01.html">A great link</a>']
+
+
+def test_relative_link_prefix_not_implemented():
+    with pytest.raises(ValueError):
+        relative_link_prefix('person', 'ward', redistricting_year=2022)
+
+    with pytest.raises(ValueError):
+        relative_link_prefix('anc', 'district')
+
+
+def test_generate_links_mismatched_index():
+    with pytest.raises(ValueError):
+        generate_links(pd.Series(['smd_2A01', 'smd_2A02'], index=[5, 7]), pd.Series(['A', 'B']))
+
+
+def test_relative_link_prefix_other_year():
+    assert relative_link_prefix('root', 'district', redistricting_year=2032) == 'map_2032/ancs/districts/'
+
+
+def test_generate_links_empty():
+    assert generate_links([], []).to_list() == []
+    assert generate_links(pd.Series([], dtype=object), pd.Series([], dtype=object)).to_list() == []